@@ -0,0 +1,57 @@
+"""Time to first byte of the first request to each host of the first import, with and without warm-up.
+
+Needs access to the PSN hosts. Every round uses a new pool, so DNS, TCP and TLS setup are paid again.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/connection_warm_up.py
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from connection_pool import ConnectionPool
+from plugin import WARM_UP_URLS
+
+ROUNDS = 5
+
+
+async def first_byte(session, url):
+    start = time.perf_counter()
+    try:
+        async with session.head(url, allow_redirects=False):
+            pass
+    except aiohttp.ClientResponseError:
+        pass
+    return time.perf_counter() - start
+
+
+async def measure(warm_up):
+    """Time to first byte per host, requests are sent one after another like in the first import"""
+    pool = ConnectionPool()
+    if warm_up:
+        # in the plugin this runs while authenticating
+        await pool.warm_up(WARM_UP_URLS)
+    times = {}
+    async with pool.create_session() as session:
+        for url in WARM_UP_URLS:
+            origin = "{0.scheme}://{0.netloc}/".format(urlsplit(url))
+            times[urlsplit(url).hostname] = await first_byte(session, origin)
+    await pool.close()
+    return times
+
+
+async def main():
+    results = {False: [], True: []}
+    for _ in range(ROUNDS):
+        for warm_up in results:
+            results[warm_up].append(await measure(warm_up))
+
+    for host in results[False][0]:
+        cold, warm = (sum(times[host] for times in results[warm_up]) / ROUNDS for warm_up in (False, True))
+        print("{:40} cold {:7.1f} ms  warm {:7.1f} ms  saved {:7.1f} ms".format(
+            host, cold * 1e3, warm * 1e3, (cold - warm) * 1e3
+        ))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
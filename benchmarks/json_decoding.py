@@ -0,0 +1,42 @@
+"""Time spent decoding JSON by each installed decoder of serialization.JSON_DECODERS.
+
+Uses the same fixtures as response_decoding.py, as utf-8 bytes the way responses are received.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/json_decoding.py
+"""
+import json
+import time
+
+import serialization
+from benchmarks.response_decoding import entitlements_page
+from tests.test_data import BACKEND_TROPHIES
+
+ROUNDS = 500
+
+
+def measure(body):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        serialization.json_loads(body)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    fixtures = {
+        "internal_entitlements page (450 entitlements)": json.dumps(entitlements_page()).encode(),
+        "earned trophies": json.dumps(BACKEND_TROPHIES).encode()
+    }
+    default = serialization.json_decoder_name
+    for name, body in fixtures.items():
+        print("{} - {} bytes".format(name, len(body)))
+        for decoder in serialization.JSON_DECODERS:
+            try:
+                serialization.use_json_decoder(decoder)
+            except ImportError:
+                print("  {:7} not installed".format(decoder))
+                continue
+            print("  {:7} {:8.1f} us".format(decoder, measure(body) * 1e6))
+    serialization.use_json_decoder(default)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Memory and time spent by AuthenticatedHttpClient.get turning a received response into JSON.
+
+Compares the current single-decode path with the previous text() + json() path,
+with debug logging disabled and enabled, on the existing test fixtures.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/response_decoding.py
+"""
+import asyncio
+import json
+import logging
+import time
+import tracemalloc
+
+from aioresponses import aioresponses
+
+from http_client import AuthenticatedHttpClient, paginate_store_url
+from psn_client import INTERNAL_ENTITLEMENTS_URL, MAX_ENTITLEMENTS_PER_REQUEST
+from tests.test_data import BACKEND_ENTITLEMENTS_WITHOUT_DLC, BACKEND_TROPHIES
+
+ROUNDS = 200
+
+
+class LegacyHttpClient(AuthenticatedHttpClient):
+    async def get(self, url, *args, **kwargs):
+        response = await self.request("GET", *args, url=url, **kwargs)
+        logging.debug("Response for:\n{url}\n{data}".format(url=url, data=await response.text()))
+        return await response.json()
+
+
+def entitlements_page():
+    entitlements = BACKEND_ENTITLEMENTS_WITHOUT_DLC["entitlements"]
+    page = [entitlements[i % len(entitlements)] for i in range(MAX_ENTITLEMENTS_PER_REQUEST)]
+    return {"entitlements": page, "total_results": len(page)}
+
+
+async def measure(client_class, url, body):
+    """Mean peak allocation and time of get() for an already received response"""
+    client = client_class("", None)
+    client._access_token = "token"
+    with aioresponses() as backend:
+        backend.get(url, body=body)
+        response = await client.request("GET", url=url)
+
+        async def request(*args, **kwargs):
+            return response
+        client.request = request
+
+        peaks = []
+        tracemalloc.start()
+        for _ in range(ROUNDS):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await client.get(url)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            await client.get(url)
+        elapsed = (time.perf_counter() - start) / ROUNDS
+    await client.logout()
+    return sum(peaks) // len(peaks), elapsed
+
+
+async def main():
+    logging.getLogger().addHandler(logging.NullHandler())
+    fixtures = {
+        "internal_entitlements page (450 entitlements)": (
+            paginate_store_url(INTERNAL_ENTITLEMENTS_URL.format(user_id="me"), MAX_ENTITLEMENTS_PER_REQUEST),
+            json.dumps(entitlements_page())
+        ),
+        "earned trophies": ("https://pl-tpy.np.community.playstation.net/trophies", json.dumps(BACKEND_TROPHIES))
+    }
+    for name, (url, body) in fixtures.items():
+        print("{} - {} bytes".format(name, len(body)))
+        for level in (logging.INFO, logging.DEBUG):
+            logging.getLogger().setLevel(level)
+            for label, client_class in (("before", LegacyHttpClient), ("after", AuthenticatedHttpClient)):
+                peak, elapsed = await measure(client_class, url, body)
+                print("  {:5} {:6} peak {:>8} B  {:8.1f} us".format(
+                    logging.getLevelName(level), label, peak, elapsed * 1e6
+                ))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Time spent by parse_timestamp and parse_timestamps compared with the strptime based parser.
+
+Parses the earned dates of a 15k trophy profile, where dates repeat within a title,
+once with a cold and once with a warm cache. Checks that every result is identical.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/timestamp_parsing.py
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import psn_client
+from psn_client import _parse_timestamp, _strptime_timestamp, parse_timestamp, parse_timestamps
+
+TITLES = 300
+TROPHIES_PER_TITLE = 50
+# trophies of a title are earned in a few sessions, several of them within the same second
+DATES_PER_TITLE = 20
+ROUNDS = 20
+
+
+def earned_dates():
+    generator = random.Random(42)
+    start = datetime(2013, 11, 15)
+    dates = []
+    for _ in range(TITLES):
+        title_dates = [
+            (start + timedelta(seconds=generator.randrange(10 * 365 * 24 * 3600))).strftime("%Y-%m-%dT%H:%M:%SZ")
+            for _ in range(DATES_PER_TITLE)
+        ]
+        dates.extend(generator.choice(title_dates) for _ in range(TROPHIES_PER_TITLE))
+    return dates
+
+
+def measure(parse, dates, cold):
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        if cold:
+            _parse_timestamp.cache_clear()
+        start = time.perf_counter()
+        parse(dates)
+        elapsed += time.perf_counter() - start
+    return elapsed / ROUNDS
+
+
+def main():
+    dates = earned_dates()
+    assert [_strptime_timestamp(date) for date in dates] == parse_timestamps(dates)
+    print("{} earned dates, {} distinct, cache size {}".format(
+        len(dates), len(set(dates)), psn_client.TIMESTAMP_CACHE_SIZE
+    ))
+    runs = (
+        ("strptime", lambda dates_: [_strptime_timestamp(date) for date in dates_]),
+        ("parse_timestamp", lambda dates_: [parse_timestamp(date) for date in dates_]),
+        ("parse_timestamps", parse_timestamps)
+    )
+    for cold in (True, False):
+        print("cold cache" if cold else "warm cache")
+        for label, parse in runs:
+            print("  {:16} {:8.2f} ms".format(label, measure(parse, dates, cold) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Time spent turning store and entitlement names into PS3 game titles.
+
+Compares the previous longest_common_prefix and chained replace calls with title_normalizer
+on thousands of entitlement names built from the test fixtures. The cold cache is the first
+sync of the library, the warm one the syncs after it.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/title_normalization.py
+"""
+import time
+import unicodedata
+
+import title_normalizer
+from tests.test_data import BACKEND_ENTITLEMENTS_WITHOUT_DLC
+
+# pairs of a large library, all of their names fit in the cache
+NAMES = 2000
+ROUNDS = 10
+SUFFIXES = ("", " Full Game Unlock", " - Full Game", " – Full Game", " Unlock")
+
+
+def legacy_longest_common_prefix(s1, s2):
+    out = ''
+    s1test = s1.lstrip("The ")
+    s2test = s2.lstrip("The ")
+    s1test = unicodedata.normalize("NFKD", s1test.casefold())
+    s2test = unicodedata.normalize("NFKD", s2test.casefold())
+    for i, j, k in zip(s1test, s2test, s1):
+        if i != j:
+            break
+        out += k
+    return out
+
+
+def legacy_title(store_name, content_name):
+    return legacy_longest_common_prefix(store_name, content_name) \
+        .replace("Full Game Unlock", "") \
+        .replace("- Full Game", "") \
+        .replace("– Full Game", "") \
+        .replace("Full Game", "") \
+        .replace("full game", "") \
+        .replace("Unlock", "") \
+        .strip()
+
+
+def title(store_name, content_name):
+    return title_normalizer.remove_unlock_suffixes(title_normalizer.longest_common_prefix(store_name, content_name))
+
+
+def name_pairs():
+    """(store name, entitlement name) of distinct games, the entitlement names carry the unlock suffixes"""
+    names = [entitlement["drm_def"]["contentName"] for entitlement in BACKEND_ENTITLEMENTS_WITHOUT_DLC["entitlements"]]
+    pairs = []
+    for i in range(NAMES):
+        store_name = "{} {}".format(title_normalizer.remove_unlock_suffixes(names[i % len(names)]), i)
+        pairs.append((store_name, store_name + SUFFIXES[i % len(SUFFIXES)]))
+    return pairs
+
+
+def measure(normalize, pairs, cold):
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        if cold:
+            title_normalizer.normalize_name.cache_clear()
+        start = time.perf_counter()
+        for store_name, content_name in pairs:
+            normalize(store_name, content_name)
+        elapsed += time.perf_counter() - start
+    return elapsed / ROUNDS
+
+
+def main():
+    pairs = name_pairs()
+    print("{} name pairs, cache size {}".format(len(pairs), title_normalizer.NORMALIZED_NAMES_CACHE_SIZE))
+    for cold in (True, False):
+        print("cold cache" if cold else "warm cache")
+        for label, normalize in (("before", legacy_title), ("after", title)):
+            print("  {:6} {:8.2f} ms".format(label, measure(normalize, pairs, cold) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
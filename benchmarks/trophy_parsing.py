@@ -0,0 +1,89 @@
+"""Time spent parsing earned trophy pages, per trophy Achievements compared with the columnar EarnedTrophies.
+
+The columnar parser is timed alone and together with creating every Achievement, which happens only
+when Galaxy asks for the achievements of a game. numpy is used for the timestamps when installed.
+Run from the repository root: PYTHONPATH=src:. python benchmarks/trophy_parsing.py
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from galaxy.api.types import Achievement
+
+import psn_client
+from psn_client import PSNClient, parse_timestamp
+
+COMMUNICATION_ID = "NPWR11556_00"
+PAGE_SIZES = (100, 1000, 10000)
+ROUNDS = 20
+
+
+def trophies_page(size):
+    start = datetime(2018, 6, 8)
+    return {"trophies": [
+        {
+            "trophyId": i,
+            "trophyName": "achievement {}".format(i),
+            "groupId": "default",
+            "fromUser": {
+                "onlineId": "user-id",
+                "earned": i % 4 != 0,
+                "earnedDate": (start + timedelta(minutes=i // 3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            }
+        } for i in range(size)
+    ]}
+
+
+def per_trophy_parser(response):
+    return [
+        Achievement(
+            achievement_id="{}_{}".format(COMMUNICATION_ID, trophy["trophyId"]),
+            achievement_name=str(trophy["trophyName"]),
+            unlock_time=parse_timestamp(trophy["fromUser"]["earnedDate"])
+        ) for trophy in response.get("trophies", [])
+        if trophy.get("fromUser") and trophy["fromUser"].get("earned")
+    ]
+
+
+class ReplayHttpClient:
+    def __init__(self, response):
+        self._response = response
+
+    async def get(self, *args, **kwargs):
+        return self._response
+
+
+async def measure(parse):
+    psn_client._parse_timestamp.cache_clear()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        psn_client._parse_timestamp.cache_clear()
+        await parse()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def main():
+    print("numpy", "installed" if psn_client.numpy is not None else "not installed")
+    for size in PAGE_SIZES:
+        page = trophies_page(size)
+        client = PSNClient(ReplayHttpClient(page), None)
+
+        async def per_trophy():
+            return per_trophy_parser(page)
+
+        async def columnar():
+            return await client.async_get_earned_trophies(COMMUNICATION_ID)
+
+        async def columnar_materialized():
+            return list(await client.async_get_earned_trophies(COMMUNICATION_ID))
+
+        assert await per_trophy() == await columnar()
+        print("{} trophies".format(size))
+        for label, parse in (
+            ("per trophy", per_trophy), ("columnar", columnar), ("columnar + achievements", columnar_materialized)
+        ):
+            print("  {:24} {:9.1f} us".format(label, await measure(parse) * 1e6))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
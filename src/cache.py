@@ -20,6 +20,11 @@ class Cache:
             return None
         return entry.value
 
+    def peek(self, key: Any):
+        """Value regardless of its timestamp"""
+        entry: Optional[CacheEntry] = self._entries.get(key)
+        return None if entry is None else entry.value
+
     def update(self, key: Any, value: Any, timestamp: UnixTimestamp):
         entry: Optional[CacheEntry] = self._entries.get(key)
         if entry is None:
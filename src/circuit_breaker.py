@@ -0,0 +1,97 @@
+import time
+from enum import Enum
+from typing import Dict
+from urllib.parse import urlsplit
+
+# consecutive failures that open the circuit
+DEFAULT_FAILURE_THRESHOLD = 5
+# seconds the circuit stays open before probing the backend again
+DEFAULT_RESET_TIMEOUT = 30.0
+# requests let through at once while half-open
+DEFAULT_HALF_OPEN_PROBES = 1
+
+
+class CircuitState(Enum):
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        half_open_probes: int = DEFAULT_HALF_OPEN_PROBES
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_probes = half_open_probes
+        self._state = CircuitState.Closed
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.Open and time.monotonic() - self._opened_at >= self._reset_timeout:
+            self._state = CircuitState.HalfOpen
+            self._probes = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CircuitState.Closed:
+            return True
+        if state == CircuitState.HalfOpen and self._probes < self._half_open_probes:
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self):
+        self._state = CircuitState.Closed
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == CircuitState.HalfOpen or self._failures >= self._failure_threshold:
+            self._open()
+
+    def record_cancelled(self):
+        """Request ended without an answer, let another probe through"""
+        if self._state == CircuitState.HalfOpen and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self):
+        self._state = CircuitState.Open
+        self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """One circuit breaker per backend host"""
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        half_open_probes: int = DEFAULT_HALF_OPEN_PROBES
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_probes = half_open_probes
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).hostname or ""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                self._failure_threshold, self._reset_timeout, self._half_open_probes
+            )
+        return breaker
+
+    def state(self, url: str) -> CircuitState:
+        return self.get(url).state
+
+    @property
+    def states(self) -> Dict[str, CircuitState]:
+        return {host: breaker.state for host, breaker in self._breakers.items()}
@@ -0,0 +1,93 @@
+import aiohttp
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Iterable
+from urllib.parse import urlsplit
+
+from galaxy.http import create_tcp_connector
+
+DEFAULT_CONNECTION_LIMIT = 40
+# has to be at least as high as the per host concurrency limits
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 10
+# seconds an idle connection is kept open
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+# seconds resolved host addresses are cached
+DEFAULT_DNS_CACHE_TTL = 600
+# seconds a warm-up request may take
+WARM_UP_TIMEOUT = 10
+
+
+@dataclass
+class ConnectionStats:
+    opened: int = 0
+    reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+
+class ConnectionPool:
+    """TCP connector shared by several client sessions"""
+    def __init__(
+        self,
+        limit: int = DEFAULT_CONNECTION_LIMIT,
+        limit_per_host: int = DEFAULT_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL
+    ):
+        self._connector = create_tcp_connector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=dns_cache_ttl
+        )
+        self._stats = ConnectionStats()
+        self._trace_config = aiohttp.TraceConfig()
+        self._trace_config.on_connection_create_end.append(self._on_connection_created)
+        self._trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        self._trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        self._trace_config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+
+    @property
+    def stats(self) -> ConnectionStats:
+        return replace(self._stats)
+
+    def create_session(self, **kwargs) -> aiohttp.ClientSession:
+        # same defaults as galaxy.http.create_client_session, which would build a spare connector
+        return aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            trace_configs=[self._trace_config],
+            raise_for_status=True,
+            **kwargs
+        )
+
+    async def warm_up(self, urls: Iterable[str]):
+        """Opens a pooled connection to the host of every url, so the first requests skip DNS and TLS setup"""
+        origins = {"{0.scheme}://{0.netloc}/".format(urlsplit(url)) for url in urls}
+        async with self.create_session(timeout=aiohttp.ClientTimeout(total=WARM_UP_TIMEOUT)) as session:
+            async def warm_up_origin(origin):
+                try:
+                    # any answer will do, the connection is what we are after
+                    async with session.head(origin, allow_redirects=False):
+                        pass
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    logging.debug("Connection warm-up to %s failed: %r", origin, error)
+
+            await asyncio.gather(*[warm_up_origin(origin) for origin in origins])
+
+    async def close(self):
+        await self._connector.close()
+
+    async def _on_connection_created(self, session, context, params):
+        self._stats.opened += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self._stats.reused += 1
+
+    async def _on_dns_cache_hit(self, session, context, params):
+        self._stats.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, context, params):
+        self._stats.dns_cache_misses += 1
@@ -0,0 +1,72 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+# a duplicate is sent when a request takes longer than this percentile of recent latencies
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# bounds of the hedge delay in seconds
+MIN_HEDGE_DELAY = 0.05
+MAX_HEDGE_DELAY = 10.0
+# latencies kept per host, hedging starts once MIN_LATENCY_SAMPLES are known
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+# at most this fraction of hedge-eligible requests is duplicated
+DEFAULT_HEDGE_RATIO = 0.1
+# hedges that can be sent in a burst
+DEFAULT_HEDGE_BURST = 5.0
+
+
+class HedgeBudget:
+    """Every hedge-eligible request earns `ratio` of a hedge, up to `burst` hedges"""
+    def __init__(self, ratio: float = DEFAULT_HEDGE_RATIO, burst: float = DEFAULT_HEDGE_BURST):
+        self._ratio = ratio
+        self._burst = burst
+        self._credit = burst
+
+    @property
+    def credit(self) -> float:
+        return self._credit
+
+    def earn(self):
+        self._credit = min(self._burst, self._credit + self._ratio)
+
+    def spend(self) -> bool:
+        if self._credit < 1:
+            return False
+        self._credit -= 1
+        return True
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget: Optional[HedgeBudget] = None,
+        window: int = LATENCY_WINDOW,
+        min_samples: int = MIN_LATENCY_SAMPLES
+    ):
+        self._percentile = percentile
+        self._budget = budget or HedgeBudget()
+        self._window = window
+        self._min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    @property
+    def budget(self) -> HedgeBudget:
+        return self._budget
+
+    def record_latency(self, url: str, latency: float):
+        host = urlsplit(url).hostname or ""
+        latencies = self._latencies.get(host)
+        if latencies is None:
+            latencies = self._latencies[host] = deque(maxlen=self._window)
+        latencies.append(latency)
+
+    def delay(self, url: str) -> Optional[float]:
+        """Seconds to wait before sending a duplicate, None while the latencies of the host are unknown"""
+        latencies = self._latencies.get(urlsplit(url).hostname or "")
+        if latencies is None or len(latencies) < self._min_samples:
+            return None
+        ordered = sorted(latencies)
+        value = ordered[min(len(ordered) - 1, int(self._percentile * len(ordered)))]
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, value))
@@ -1,18 +1,37 @@
 import aiohttp
+import asyncio
 import logging
-
+import random
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from typing import Any, Dict, Optional
 from urllib.parse import parse_qsl, urlsplit
 
 from galaxy.api.errors import (
+    ApplicationError,
     AuthenticationRequired,
     BackendError,
     BackendNotAvailable,
     BackendTimeout,
     NetworkError,
     InvalidCredentials,
+    TooManyRequests,
     UnknownBackendResponse
 )
-from galaxy.http import handle_exception, create_client_session
+from galaxy.http import handle_exception
+
+import serialization
+from circuit_breaker import CircuitBreakers, CircuitState
+from connection_pool import ConnectionPool
+from hedging import Hedger
+from request_stats import RequestStats
+from throttling import ConcurrencyLimiter, RateLimiter
 
 
 OAUTH_LOGIN_REDIRECT_URL = "https://my.playstation.com/auth/response.html"
@@ -79,6 +98,145 @@ OAUTH_STORE_TOKEN_URL = OAUTH_URL_BASE.format(scope=STORE_SCOPE, redirect=OAUTH_
 
 DEFAULT_TIMEOUT = 30
 
+# renew access token this many seconds before it expires
+TOKEN_RENEWAL_MARGIN = 120
+MIN_TOKEN_RENEWAL_DELAY = 10
+# a renewal failing for independent reasons is retried after this many seconds, doubled on each failure
+TOKEN_RENEWAL_RETRY_DELAY = 5
+MAX_TOKEN_RENEWAL_RETRY_DELAY = 60
+
+# how much of a response body is logged in debug mode, None for everything
+DEBUG_LOG_BODY_LIMIT = 4096
+
+
+RETRYABLE_ERRORS = (BackendNotAvailable, BackendTimeout, BackendError, NetworkError, TooManyRequests)
+# errors meaning the backend host is unhealthy
+CIRCUIT_BREAKER_ERRORS = (BackendNotAvailable, BackendTimeout, BackendError, NetworkError)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # fraction of the backoff delay that is randomized
+    jitter: float = 0.5
+    # longer Retry-After is not worth waiting for
+    max_retry_after: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+# per host, other hosts use DEFAULT_RETRY_POLICY
+RETRY_POLICIES = {
+    "pl-tpy.np.community.playstation.net": RetryPolicy(max_attempts=4),
+    "gamelist.api.playstation.com": RetryPolicy(max_attempts=4),
+    "commerce.api.np.km.playstation.net": RetryPolicy(max_attempts=4),
+    # game info lookups are best effort and tried in several countries anyway
+    "store.playstation.com": RetryPolicy(max_attempts=2)
+}
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+DEFAULT_RETRY_BUDGET = 10
+DEFAULT_RETRY_BUDGET_DELAY = 60.0
+
+
+class RetryBudget:
+    """Retries shared by all requests made by one operation"""
+    def __init__(self, max_retries: int = DEFAULT_RETRY_BUDGET, max_delay: float = DEFAULT_RETRY_BUDGET_DELAY):
+        self.retries_left = max_retries
+        self.delay_left = max_delay
+
+    def consume(self, delay: float) -> bool:
+        if self.retries_left <= 0 or delay > self.delay_left:
+            return False
+        self.retries_left -= 1
+        self.delay_left -= delay
+        return True
+
+
+_retry_budget = ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(max_retries: int = DEFAULT_RETRY_BUDGET, max_delay: float = DEFAULT_RETRY_BUDGET_DELAY):
+    """Requests made within the block (including tasks started in it) share one budget;
+    nested blocks reuse the outermost one"""
+    budget = _retry_budget.get()
+    if budget is not None:
+        yield budget
+        return
+
+    budget = RetryBudget(max_retries, max_delay)
+    token = _retry_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _retry_budget.reset(token)
+
+
+def _get_retry_after(error) -> Optional[float]:
+    """Retry-After of the response that caused the error, handle_exception keeps it as the context"""
+    headers = getattr(error.__context__, "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_error_status(error) -> str:
+    """HTTP status of the response that caused the error, or the error name if there was no response"""
+    status = getattr(error.__context__, "status", None)
+    return type(error).__name__ if status is None else str(status)
+
+
+DEFAULT_REVALIDATION_CACHE_SIZE = 256
+
+
+@dataclass
+class ValidatedResponse:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: Any
+
+
+class RevalidationCache:
+    """Parsed bodies of GET responses with their validators, least recently used are evicted"""
+    def __init__(self, max_size: int = DEFAULT_REVALIDATION_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: Dict[str, ValidatedResponse] = OrderedDict()
+
+    def get(self, url: str) -> Optional[ValidatedResponse]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def update(self, url: str, headers, body: Any):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            self._entries.pop(url, None)
+            return
+        self._entries[url] = ValidatedResponse(etag, last_modified, body)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
 
 def paginate_url(url, limit, offset=0):
     return url + "&limit={limit}&offset={offset}".format(limit=limit, offset=offset)
@@ -87,18 +245,91 @@ def paginate_store_url(url, size, start=0):
     return url + "&size={size}&start={start}".format(size=size, start=start)
 
 
+@dataclass
+class HttpClientMetrics:
+    token_refreshes: int = 0
+    proactive_token_refreshes: int = 0
+    failed_token_refreshes: int = 0
+    retries: int = 0
+    coalesced_requests: int = 0
+    revalidated_responses: int = 0
+    hedged_requests: int = 0
+    hedge_wins: int = 0
+
+
 class AuthenticatedHttpClient:
-    def __init__(self, token_url, auth_lost_callback):
+    def __init__(
+        self,
+        token_url,
+        auth_lost_callback,
+        concurrency_limiter=None,
+        rate_limiter=None,
+        connection_pool=None,
+        circuit_breakers=None,
+        hedger=None,
+        request_stats=None,
+        token_refreshed_callback=None,
+        debug_log_body_limit=DEBUG_LOG_BODY_LIMIT,
+        debug_log_sample_rate=1.0,
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None
+    ):
         self._access_token = None
         self._refresh_token = None
         self._token_url = token_url
         self._auth_lost_callback = auth_lost_callback
-        self._session = create_client_session(timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT))
+        self._token_refreshed_callback = token_refreshed_callback
+        self._concurrency_limiter = concurrency_limiter or ConcurrencyLimiter()
+        self._rate_limiter = rate_limiter or RateLimiter()
+        self._circuit_breakers = circuit_breakers or CircuitBreakers()
+        self._hedger = hedger or Hedger()
+        self._request_stats = request_stats or RequestStats()
+        self._access_token_expires_at = None
+        self._refresh_task = None
+        self._renewal_task = None
+        self._metrics = HttpClientMetrics()
+        self._debug_log_body_limit = debug_log_body_limit
+        self._debug_log_sample_rate = debug_log_sample_rate
+        self._retry_policies = RETRY_POLICIES if retry_policies is None else retry_policies
+        self._in_flight_gets = {}
+        self._revalidation_cache = RevalidationCache()
+        self._owns_connection_pool = connection_pool is None
+        self._connection_pool = connection_pool or ConnectionPool()
+        self._session = self._connection_pool.create_session(timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT))
 
     @property
     def is_authenticated(self):
         return self._access_token is not None
 
+    @property
+    def concurrency_stats(self):
+        return self._concurrency_limiter.stats
+
+    def circuit_state(self, url) -> CircuitState:
+        return self._circuit_breakers.state(url)
+
+    @property
+    def request_stats(self):
+        return self._request_stats.endpoints
+
+    @property
+    def connection_stats(self):
+        return self._connection_pool.stats
+
+    @property
+    def rate_limit_levels(self):
+        return self._rate_limiter.levels
+
+    @property
+    def metrics(self):
+        return replace(self._metrics)
+
+    @property
+    def access_token_state(self):
+        """Access token with its expiry, if known; suitable for persisting"""
+        if self._access_token is None or self._access_token_expires_at is None:
+            return None
+        return {"access_token": self._access_token, "expires_at": self._access_token_expires_at}
+
     def _auth_lost(self):
         self._access_token = None
         self._refresh_token = None
@@ -121,7 +352,9 @@ class AuthenticatedHttpClient:
             )
             location_params = urlsplit(response.headers["Location"])
             self._validate_auth_response(location_params)
-            return dict(parse_qsl(location_params.fragment))["access_token"]
+            token_params = dict(parse_qsl(location_params.fragment))
+            self._access_token_expires_at = self._parse_expires_in(token_params.get("expires_in"))
+            return token_params["access_token"]
         except AuthenticationRequired as e:
             raise InvalidCredentials(e.data)
         except (KeyError, IndexError):
@@ -130,34 +363,106 @@ class AuthenticatedHttpClient:
             if response:
                 response.close()
 
+    @staticmethod
+    def _parse_expires_in(expires_in):
+        try:
+            return time.time() + int(expires_in)
+        except (TypeError, ValueError):
+            return None
+
     async def authenticate(self, refresh_token):
         self._refresh_token = refresh_token
+        self._access_token_expires_at = None
         self._access_token = await self.get_access_token(self._refresh_token)
         if not self._access_token:
             raise UnknownBackendResponse("Empty access token")
+        self._schedule_token_renewal()
 
-    async def _refresh_access_token(self):
+    def restore_access_token(self, refresh_token, access_token_state):
+        """Reuses persisted access token, it is validated lazily by the first request"""
         try:
+            access_token = access_token_state["access_token"]
+            expires_at = float(access_token_state["expires_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not access_token or expires_at < time.time() + TOKEN_RENEWAL_MARGIN:
+            return False
+
+        self._refresh_token = refresh_token
+        self._access_token = access_token
+        self._access_token_expires_at = expires_at
+        self._schedule_token_renewal()
+        return True
+
+    def _schedule_token_renewal(self):
+        if self._renewal_task is not None:
+            self._renewal_task.cancel()
+            self._renewal_task = None
+        if self._access_token_expires_at is None:
+            return
+        delay = max(
+            self._access_token_expires_at - TOKEN_RENEWAL_MARGIN - time.time(),
+            MIN_TOKEN_RENEWAL_DELAY
+        )
+        self._renewal_task = asyncio.ensure_future(self._renew_access_token(delay))
+
+    async def _renew_access_token(self, delay, failures=0):
+        await asyncio.sleep(delay)
+        # refreshing reschedules the renewal, do not let it cancel this task
+        self._renewal_task = None
+        self._metrics.proactive_token_refreshes += 1
+        try:
+            await self._refresh_access_token(self._access_token)
+        except (BackendNotAvailable, BackendTimeout, BackendError, NetworkError):
+            retry_delay = min(TOKEN_RENEWAL_RETRY_DELAY * 2 ** failures, MAX_TOKEN_RENEWAL_RETRY_DELAY)
+            logging.warning("Failed to renew access token before its expiry, retrying in %ds", retry_delay)
+            # unless a refresh in the meantime has scheduled the next renewal
+            if self._renewal_task is None:
+                self._renewal_task = asyncio.ensure_future(self._renew_access_token(retry_delay, failures + 1))
+        except Exception:
+            logging.warning("Failed to renew access token before its expiry")
+
+    async def _refresh_access_token(self, expired_token=None):
+        """Concurrent callers share a single in-flight refresh"""
+        if expired_token is not None and expired_token != self._access_token:
+            # somebody has already refreshed the token this request was sent with
+            return
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._do_refresh_access_token())
+        await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh_access_token(self):
+        try:
+            # the expiry of the current token is kept until the new one is received
             self._access_token = await self.get_access_token(self._refresh_token)
             if not self._access_token:
                 raise UnknownBackendResponse("Empty access token")
+            self._metrics.token_refreshes += 1
+            self._schedule_token_renewal()
+            if self._token_refreshed_callback:
+                self._token_refreshed_callback()
         except (BackendNotAvailable, BackendTimeout, BackendError, NetworkError):
             logging.warning("Failed to refresh token for independent reasons")
+            self._metrics.failed_token_refreshes += 1
             raise
         except Exception:
             logging.exception("Failed to refresh token")
+            self._metrics.failed_token_refreshes += 1
             if self._auth_lost_callback:
                 self._auth_lost_callback()
             raise AuthenticationRequired()
+        finally:
+            self._refresh_task = None
 
     async def request(self, method, *args, **kwargs):
         if not self._access_token:
             raise AuthenticationRequired()
 
+        access_token = self._access_token
         try:
             return await self._oauth_request(method, *args, **kwargs)
         except AuthenticationRequired:
-            await self._refresh_access_token()
+            await self._refresh_access_token(access_token)
             return await self._oauth_request(method, *args, **kwargs)
 
     async def _oauth_request(self, method, *args, **kwargs):
@@ -165,15 +470,203 @@ class AuthenticatedHttpClient:
         headers["authorization"] = "Bearer " + self._access_token
         return await self._request(method, *args, **kwargs)
 
-    async def _request(self, method, *args, **kwargs):
-        with handle_exception():
-            return await self._session.request(method, *args, **kwargs)
+    def _get_retry_policy(self, method, url) -> Optional[RetryPolicy]:
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return None
+        return self._retry_policies.get(urlsplit(url).hostname, DEFAULT_RETRY_POLICY)
+
+    async def _request(self, method, url, *args, hedge=False, **kwargs):
+        policy = self._get_retry_policy(method, url)
+        hedge = hedge and method.upper() in IDEMPOTENT_METHODS
+        breaker = self._circuit_breakers.get(url)
+        attempt = 1
+        while True:
+            if not breaker.allow_request():
+                logging.warning("Circuit open, not sending request to %s", url)
+                raise BackendNotAvailable()
+            try:
+                if hedge:
+                    return await self._send_hedged_request(breaker, method, url, *args, **kwargs)
+                return await self._send_guarded_request(breaker, method, url, *args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                if policy is None or attempt >= policy.max_attempts:
+                    raise
+
+                retry_after = _get_retry_after(error)
+                if retry_after is not None and retry_after > policy.max_retry_after:
+                    raise
+                delay = policy.backoff(attempt) if retry_after is None else retry_after
+
+                budget = _retry_budget.get()
+                if budget is not None and not budget.consume(delay):
+                    logging.warning("Retry budget exhausted, giving up on %s", url)
+                    raise
+
+                logging.warning(
+                    "%s for %s, retrying in %.1fs (attempt %d/%d)",
+                    type(error).__name__, url, delay, attempt + 1, policy.max_attempts
+                )
+                self._metrics.retries += 1
+                self._request_stats.record_retry(url)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _send_hedged_request(self, breaker, method, url, *args, **kwargs):
+        """Sends a duplicate when the request takes longer than usual for the host, the first answer wins"""
+        self._hedger.budget.earn()
+        primary_sent = asyncio.Event()
+        primary = asyncio.ensure_future(
+            self._send_guarded_request(breaker, method, url, *args, sent=primary_sent, **kwargs)
+        )
+        pending = {primary}
+        try:
+            delay = self._hedger.delay(url)
+            if delay is not None:
+                # the delay only counts once the request is on the wire, not while it waits for a token or a slot
+                sending = asyncio.ensure_future(primary_sent.wait())
+                try:
+                    await asyncio.wait({primary, sending}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    sending.cancel()
+                done, pending = await asyncio.wait(pending, timeout=delay)
+                if not done and self._can_hedge(breaker, url) and self._hedger.budget.spend():
+                    logging.debug("No response within %.2fs, hedging request to %s", delay, url)
+                    self._metrics.hedged_requests += 1
+                    pending.add(asyncio.ensure_future(
+                        self._send_guarded_request(breaker, method, url, *args, **kwargs)
+                    ))
+
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if succeeded[0] is not primary:
+                        self._metrics.hedge_wins += 1
+                    return succeeded[0].result()
+                if not pending:
+                    # every copy failed
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _can_hedge(self, breaker, url) -> bool:
+        # a duplicate waiting behind the throttling would only add to the load it is waiting for
+        return breaker.state == CircuitState.Closed \
+            and self._rate_limiter.available(url) and self._concurrency_limiter.available(url)
+
+    async def _send_guarded_request(self, breaker, method, url, *args, **kwargs):
+        try:
+            response = await self._send_request(method, url, *args, **kwargs)
+        except CIRCUIT_BREAKER_ERRORS:
+            breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception:
+            # the host answered, even if not with what we wanted
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return response
+
+    async def _send_request(self, method, url, *args, sent=None, **kwargs):
+        """sent is set once the request got its token and slot and goes on the wire"""
+        await self._rate_limiter.acquire(url)
+        async with self._concurrency_limiter.acquire(url):
+            if sent is not None:
+                sent.set()
+            start = time.monotonic()
+            try:
+                with handle_exception():
+                    response = await self._session.request(method, url, *args, **kwargs)
+                    # read the body while holding the slot, so the limit covers the whole exchange
+                    body = await response.read()
+            except ApplicationError as error:
+                self._request_stats.record_response(url, _get_error_status(error), time.monotonic() - start)
+                raise
+            self._request_stats.record_response(url, str(response.status), time.monotonic() - start, len(body))
+        self._hedger.record_latency(url, time.monotonic() - start)
+        return response
+
+    def _log_response(self, url, body):
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+        if self._debug_log_sample_rate < 1 and random.random() >= self._debug_log_sample_rate:
+            return
+
+        limit = self._debug_log_body_limit
+        truncated = limit is not None and len(body) > limit
+        data = (body[:limit] if truncated else body).decode("utf-8", errors="replace")
+        logging.debug("Response for:\n{url}\n{data}{suffix}".format(
+            url=url,
+            data=data,
+            suffix="... ({} bytes total)".format(len(body)) if truncated else ""
+        ))
+
+    async def get(self, url, *args, coalesce=False, **kwargs):
+        """With coalesce=True concurrent identical GETs share one request and one parsed result,
+        which callers must not modify.
+        With revalidate=True the parsed body is kept with the response validators and served again
+        when the backend answers a conditional request with 304 Not Modified.
+        With hedge=True a duplicate is sent when the backend is slower than usual to answer."""
+        key = self._get_coalescing_key(url, args, kwargs) if coalesce else None
+        if key is None:
+            return await self._get(url, *args, **kwargs)
+
+        task = self._in_flight_gets.get(key)
+        if task is not None:
+            self._metrics.coalesced_requests += 1
+        else:
+            task = self._in_flight_gets[key] = asyncio.ensure_future(self._get(url, **kwargs))
+
+            def done(_):
+                if self._in_flight_gets.get(key) is task:
+                    del self._in_flight_gets[key]
+            task.add_done_callback(done)
+
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _get_coalescing_key(url, args, kwargs):
+        if args:
+            return None
+        try:
+            return url, frozenset(kwargs.items())
+        except TypeError:
+            # unhashable arguments, e.g. custom headers
+            return None
+
+    async def _get(self, url, *args, revalidate=False, **kwargs):
+        cached = self._revalidation_cache.get(url) if revalidate else None
+        if cached is not None:
+            headers = kwargs["headers"] = dict(kwargs.get("headers") or {})
+            if cached.etag is not None:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified is not None:
+                headers["If-Modified-Since"] = cached.last_modified
 
-    async def get(self, url, *args, **kwargs):
         response = await self.request("GET", *args, url=url, **kwargs)
+        if cached is not None and response.status == HTTPStatus.NOT_MODIFIED:
+            logging.debug("Not modified:\n{url}".format(url=url))
+            self._metrics.revalidated_responses += 1
+            return cached.body
+
+        body = await response.read()
+        self._log_response(url, body)
+        data = self._parse_body(url, body)
+        if revalidate:
+            self._revalidation_cache.update(url, response.headers, data)
+        return data
+
+    @staticmethod
+    def _parse_body(url, body):
+        if not body.strip():
+            return None
         try:
-            logging.debug("Response for:\n{url}\n{data}".format(url=url, data=await response.text()))
-            return await response.json()
+            # orjson and ujson parse the utf-8 bytes directly, the stdlib json decodes them to a str first
+            return serialization.json_loads(body)
         except ValueError:
             logging.exception("Invalid response data for:\n{url}".format(url=url))
             raise UnknownBackendResponse()
@@ -183,4 +676,9 @@ class AuthenticatedHttpClient:
         return await self.request("POST", *args, url=url, **kwargs)
 
     async def logout(self):
+        if self._renewal_task is not None:
+            self._renewal_task.cancel()
+            self._renewal_task = None
         await self._session.close()
+        if self._owns_connection_pool:
+            await self._connection_pool.close()
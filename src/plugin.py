@@ -1,10 +1,11 @@
 import asyncio
 import binascii
-import json
 import logging
+import os
 import pickle
 import sys
-from collections import defaultdict
+import time
+from collections import Counter, defaultdict
 
 from galaxy.api.plugin import Plugin, create_and_run_plugin
 from galaxy.api.types import Authentication, NextStep, Achievement, UserPresence, PresenceState, Game, GameLibrarySettings, LicenseInfo
@@ -14,12 +15,17 @@ from galaxy.api.jsonrpc import InvalidParams
 
 import serialization
 from cache import Cache
+from circuit_breaker import CircuitBreakers
+from connection_pool import ConnectionPool
 from http_client import AuthenticatedHttpClient
+from request_stats import RequestStats
+from throttling import ConcurrencyLimiter, RateLimiter
 from psn_client import (
-    CommunicationId, TitleId, EntitlementId, GameInfo, Entitlement, TrophyTitles, UnixTimestamp,
-    PSNClient, MAX_TITLE_IDS_PER_REQUEST, VALID_CLASSIFICATIONS
+    CommunicationId, TitleId, EntitlementId, GameInfo, Entitlement, EarnedTrophies, TrophyGroupId, TrophyTitle,
+    TrophyTitles, UnixTimestamp, OwnedGame, PSNClient, ENDPOINT_TEMPLATES, MAX_TITLE_IDS_PER_REQUEST, VALID_CLASSIFICATIONS,
+    GAME_LIST_URL, INTERNAL_ENTITLEMENTS_URL, TROPHY_TITLES_URL
 )
-from typing import Dict, List, Set, Iterable, Tuple, Optional, Any
+from typing import AsyncIterator, Dict, List, Set, Iterable, Sequence, Tuple, Optional, Any
 from version import __version__
 
 from http_client import OAUTH_LOGIN_URL, OAUTH_LOGIN_REDIRECT_URL, OAUTH_TOKEN_URL, OAUTH_STORE_TOKEN_URL
@@ -34,20 +40,67 @@ AUTH_PARAMS = {
 
 _CID_TIDS_DICT = Dict[TitleId, Set[CommunicationId]]
 _TID_CIDS_DICT = Dict[CommunicationId, Set[TitleId]]
-_TID_TROPHIES_DICT = Dict[TitleId, List[Achievement]]
 
 TROPHIES_CACHE_KEY = "trophies"
+TROPHY_GROUPS_CACHE_KEY = "trophy_groups"
 COMMUNICATION_IDS_CACHE_KEY = "communication_ids"
 ENTITLEMENTS_CACHE_KEY = "entitlements"
 GAME_INFO_CACHE_KEY = "game_info"
+OWNED_GAMES_CACHE_KEY = "owned_games"
+
+# seconds between full game list syncs, the ones in between only fetch titles played since the last sync
+FULL_GAME_LIST_SYNC_INTERVAL = 24 * 60 * 60
+
+SESSION_KEY = "session"
+NETWORK_TOKEN_KEY = "access_token"
+STORE_TOKEN_KEY = "store_access_token"
+
+# request statistics are written as JSON to this file when set
+HTTP_STATS_FILE_ENV = "PSN_HTTP_STATS_FILE"
+HTTP_STATS_DUMP_INTERVAL = 300
+
+# PS3 titles resolved in the store at once, each takes up to two requests per country
+MAX_GAME_INFO_LOOKUPS = 6
+
+# hosts of the first import, connected to while authenticating
+WARM_UP_URLS = [GAME_LIST_URL, INTERNAL_ENTITLEMENTS_URL, TROPHY_TITLES_URL]
 
 class PSNPlugin(Plugin):
     def __init__(self, reader, writer, token):
         super().__init__(Platform.Test, __version__, reader, writer, token)
-        self._http_client = AuthenticatedHttpClient(OAUTH_TOKEN_URL, self.lost_authentication)
-        self._store_http_client = AuthenticatedHttpClient(OAUTH_STORE_TOKEN_URL, self.lost_authentication)
+        self._concurrency_limiter = ConcurrencyLimiter()
+        self._rate_limiter = RateLimiter()
+        self._connection_pool = ConnectionPool()
+        self._circuit_breakers = CircuitBreakers()
+        self._request_stats = RequestStats(ENDPOINT_TEMPLATES)
+        self._http_stats_file = os.environ.get(HTTP_STATS_FILE_ENV)
+        self._next_http_stats_dump = time.monotonic() + HTTP_STATS_DUMP_INTERVAL
+        self._http_client = AuthenticatedHttpClient(
+            OAUTH_TOKEN_URL, self.lost_authentication,
+            concurrency_limiter=self._concurrency_limiter,
+            rate_limiter=self._rate_limiter,
+            connection_pool=self._connection_pool,
+            circuit_breakers=self._circuit_breakers,
+            request_stats=self._request_stats,
+            token_refreshed_callback=self._store_session
+        )
+        self._store_http_client = AuthenticatedHttpClient(
+            OAUTH_STORE_TOKEN_URL, self.lost_authentication,
+            concurrency_limiter=self._concurrency_limiter,
+            rate_limiter=self._rate_limiter,
+            connection_pool=self._connection_pool,
+            circuit_breakers=self._circuit_breakers,
+            request_stats=self._request_stats,
+            token_refreshed_callback=self._store_session
+        )
         self._psn_client = PSNClient(self._http_client, self._store_http_client)
         self._trophies_cache = Cache()
+        # earned trophies per trophy group at the time of the cached trophies
+        self._trophy_groups_cache = Cache()
+        self._npsso = None
+        self._auth_info: Optional[Authentication] = None
+        self._warm_up_task = None
+        self._game_info_lookups = asyncio.Semaphore(MAX_GAME_INFO_LOOKUPS)
         logging.getLogger("urllib3").setLevel(logging.FATAL)
 
     @property
@@ -66,20 +119,70 @@ class PSNPlugin(Plugin):
         if not npsso:
             raise InvalidCredentials()
 
+        self._start_warm_up()
         await asyncio.gather(
             self._http_client.authenticate(npsso),
             self._store_http_client.authenticate(npsso)
         )
         user_id, user_name = await self._psn_client.async_get_own_user_info()
 
-        return Authentication(user_id=user_id, user_name=user_name)
+        self._npsso = npsso
+        self._auth_info = Authentication(user_id=user_id, user_name=user_name)
+        return self._auth_info
+
+    def _restore_session(self, npsso, session) -> Optional[Authentication]:
+        """Warm start: reuse persisted access tokens without contacting the backend"""
+        try:
+            auth_info = Authentication(user_id=session["user_id"], user_name=session["user_name"])
+            network_token, store_token = session[NETWORK_TOKEN_KEY], session[STORE_TOKEN_KEY]
+        except (KeyError, TypeError):
+            return None
+
+        if not (
+            self._http_client.restore_access_token(npsso, network_token)
+            and self._store_http_client.restore_access_token(npsso, store_token)
+        ):
+            return None
+
+        self._npsso = npsso
+        self._auth_info = auth_info
+        self._start_warm_up()
+        return auth_info
+
+    def _start_warm_up(self):
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._connection_pool.warm_up(WARM_UP_URLS))
+
+    def _create_credentials(self):
+        credentials = {"npsso": self._npsso}
+        network_token = self._http_client.access_token_state
+        store_token = self._store_http_client.access_token_state
+        if self._auth_info and network_token and store_token:
+            credentials[SESSION_KEY] = {
+                "user_id": self._auth_info.user_id,
+                "user_name": self._auth_info.user_name,
+                NETWORK_TOKEN_KEY: network_token,
+                STORE_TOKEN_KEY: store_token
+            }
+        return credentials
+
+    def _store_session(self):
+        credentials = self._create_credentials()
+        if self._npsso and SESSION_KEY in credentials:
+            self.store_credentials(credentials)
 
     async def authenticate(self, stored_credentials=None):
         stored_npsso = stored_credentials.get("npsso") if stored_credentials else None
         if not stored_npsso:
             return NextStep("web_session", AUTH_PARAMS)
 
-        return await self._do_auth(stored_npsso)
+        auth_info = self._restore_session(stored_npsso, stored_credentials.get(SESSION_KEY))
+        if auth_info:
+            return auth_info
+
+        auth_info = await self._do_auth(stored_npsso)
+        self._store_session()
+        return auth_info
 
     async def pass_login_credentials(self, step, credentials, cookies):
         def get_npsso():
@@ -89,7 +192,7 @@ class PSNPlugin(Plugin):
 
         npsso = get_npsso()
         auth_info = await self._do_auth(npsso)
-        self.store_credentials({"npsso": npsso})
+        self.store_credentials(self._create_credentials())
         return auth_info
 
     @staticmethod
@@ -118,10 +221,14 @@ class PSNPlugin(Plugin):
         ])
 
         self._comm_ids_cache.update(delta)
-        self.push_cache()
         return delta
 
-    async def get_game_communication_ids(self, title_ids: List[TitleId]) -> Dict[TitleId, List[CommunicationId]]:
+    async def get_game_communication_ids(
+        self,
+        title_ids: List[TitleId],
+        push_cache: bool = True
+    ) -> Dict[TitleId, List[CommunicationId]]:
+        """With push_cache=False newly resolved ids are only stored, the caller pushes the cache later"""
         result: Dict[TitleId, List[CommunicationId]] = dict()
         misses: Set[TitleId] = set()
         for title_id in title_ids:
@@ -133,13 +240,14 @@ class PSNPlugin(Plugin):
 
         if misses:
             result.update(await self.update_communication_id_cache(list(misses)))
+            if push_cache:
+                self.push_cache()
 
         return result
 
     def update_entitlements_cache(self, entitlements: List[Entitlement]) \
         -> Dict[EntitlementId, Entitlement]:
         self._entitlements_cache.update({e["id"]: e for e in entitlements})
-        self.push_cache()
 
     def get_entitlement_from_cache(self, id: EntitlementId) -> Entitlement:
         return self._entitlements_cache.get(id)
@@ -147,10 +255,14 @@ class PSNPlugin(Plugin):
     async def update_ps3_game_info_cache(self, entitlements: List[Entitlement]) \
             -> Dict[EntitlementId, GameInfo]:
         async def updater(entitlement: Entitlement):
-            try:
-                value = await self._psn_client.async_get_game_info(entitlement)
-            except:
-                value = None
+            async with self._game_info_lookups:
+                if not self._psn_client.is_store_available:
+                    # defer resolution to a later sync instead of waiting for the store to time out
+                    return
+                try:
+                    value = await self._psn_client.async_get_game_info(entitlement)
+                except:
+                    value = None
             delta.update({entitlement["id"]: value})
 
         delta: Dict[EntitlementId, GameInfo] = dict()
@@ -159,10 +271,14 @@ class PSNPlugin(Plugin):
         ])
 
         self._ps3_game_info_cache.update(delta)
-        self.push_cache()
         return delta
 
-    async def get_ps3_game_info(self, ps3_entitlements: List[Entitlement]) -> Dict[EntitlementId, GameInfo]:
+    async def get_ps3_game_info(
+        self,
+        ps3_entitlements: List[Entitlement],
+        push_cache: bool = True
+    ) -> Dict[EntitlementId, GameInfo]:
+        """With push_cache=False newly resolved game info is only stored, the caller pushes the cache later"""
         result: Dict[EntitlementId, GameInfo] = dict()
         misses: List[Entitlement] = list()
         for ps3_entitlement in ps3_entitlements:
@@ -175,36 +291,108 @@ class PSNPlugin(Plugin):
 
         if misses:
             result.update(await self.update_ps3_game_info_cache(misses))
+            if push_cache:
+                self.push_cache()
 
         return result
 
-    async def get_owned_games(self):
-        async def filter_games(titles):
-            comm_id_map = await self.get_game_communication_ids([t.game_id for t in titles])
-            return [title for title in titles if self._is_game(comm_id_map[title.game_id])]
-
-        async def map_entitlements_to_ps3_games(entitlements):
-            game_info_map = await self.get_ps3_game_info(entitlements)
-            return [
-                self._create_ps3_game(entitlement, game_info_map[entitlement["id"]])
-                    for entitlement in entitlements
-                    if game_info_map[entitlement["id"]] and \
-                        game_info_map[entitlement["id"]]["classification"] in VALID_CLASSIFICATIONS
+    @staticmethod
+    async def _resolve_while_paging(pages: AsyncIterator[List], resolve) -> Tuple[List, Dict]:
+        """Collects the pages and the merged results of `resolve`, which gets every page as soon as it arrives"""
+        items: List = []
+        lookups = []
+        try:
+            async for page in pages:
+                items.extend(page)
+                if page:
+                    lookups.append(asyncio.ensure_future(resolve(page)))
+
+            result: Dict = dict()
+            for page_result in await asyncio.gather(*lookups):
+                result.update(page_result)
+        finally:
+            for lookup in lookups:
+                if not lookup.cancel() and not lookup.cancelled():
+                    lookup.exception()
+
+        return items, result
+
+    def _get_owned_games_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Game list of the last sync, as long as a full sync is not due"""
+        snapshot = self.persistent_cache.get(OWNED_GAMES_CACHE_KEY)
+        if not isinstance(snapshot, dict) or snapshot.get("played_after") is None:
+            return None
+        if time.time() - snapshot.get("full_sync_time", 0) >= FULL_GAME_LIST_SYNC_INTERVAL:
+            return None
+        return snapshot
+
+    async def _filter_owned_games(self) -> List[Game]:
+        """Communication ids of the titles on a game list page are resolved while the next pages are fetched"""
+        snapshot = self._get_owned_games_snapshot()
+        played_after = snapshot["played_after"] if snapshot else None
+        owned_games, comm_id_map = await self._resolve_while_paging(
+            self._psn_client.async_stream_owned_games(played_after),
+            lambda page: self.get_game_communication_ids(
+                [owned_game.game.game_id for owned_game in page], push_cache=False
+            )
+        )
+        titles = [owned_game.game for owned_game in owned_games]
+
+        if snapshot:
+            # titles not played since the last sync keep their place
+            recent = {title.game_id for title in titles}
+            unchanged = [
+                Game(game_id, game_title, [], LicenseInfo(LicenseType.SinglePurchase, None))
+                for game_id, game_title in snapshot["games"] if game_id not in recent
             ]
+            if unchanged:
+                comm_id_map.update(await self.get_game_communication_ids(
+                    [title.game_id for title in unchanged], push_cache=False
+                ))
+            titles.extend(unchanged)
+
+        # pushes the communication ids resolved above together with the snapshot
+        self._store_owned_games_snapshot(titles, owned_games, snapshot)
+        return [title for title in titles if self._is_game(comm_id_map[title.game_id])]
+
+    def _store_owned_games_snapshot(
+        self, titles: List[Game], recent: List[OwnedGame], previous: Optional[Dict[str, Any]]
+    ):
+        last_played = [owned_game.last_played for owned_game in recent if owned_game.last_played is not None]
+        if previous:
+            last_played.append(previous["played_after"])
+        self.persistent_cache[OWNED_GAMES_CACHE_KEY] = {
+            "played_after": max(last_played, default=None),
+            "full_sync_time": previous["full_sync_time"] if previous else time.time(),
+            "games": [[title.game_id, title.game_title] for title in titles]
+        }
+        self.push_cache()
 
-        result = await asyncio.gather(
-            self._psn_client.async_get_owned_games(),
-            self._psn_client.async_get_owned_ps3_entitlements()
-        )
+    async def _map_owned_ps3_games(self) -> List[Game]:
+        """PS3 titles of an entitlement page are resolved while the next pages are fetched"""
+        def resolve(entitlements: List[Entitlement]):
+            self.update_entitlements_cache(entitlements)
+            return self.get_ps3_game_info(entitlements, push_cache=False)
 
-        self.update_entitlements_cache(result[1])
+        entitlements, game_info_map = await self._resolve_while_paging(
+            self._psn_client.async_stream_owned_ps3_entitlements(), resolve
+        )
+        # the entitlements and game info of all pages in one push
+        self.push_cache()
+        return [
+            self._create_ps3_game(entitlement, game_info_map[entitlement["id"]])
+                for entitlement in entitlements
+                if game_info_map.get(entitlement["id"]) and \
+                    game_info_map[entitlement["id"]]["classification"] in VALID_CLASSIFICATIONS
+        ]
 
-        filtered_result = await asyncio.gather(
-            filter_games(result[0]),
-            map_entitlements_to_ps3_games(result[1])
+    async def get_owned_games(self):
+        games, ps3_games = await asyncio.gather(
+            self._filter_owned_games(),
+            self._map_owned_ps3_games()
         )
 
-        return filtered_result[0] + filtered_result[1]
+        return games + ps3_games
 
     async def get_game_library_settings(self, game_id: str, context: Any) -> GameLibrarySettings:
         if not context:
@@ -244,16 +432,18 @@ class PSNPlugin(Plugin):
 
     async def prepare_achievements_context(self, game_ids: List[str]) -> Any:
         games_cids = await self.get_game_communication_ids(game_ids)
-        trophy_titles = await self._psn_client.get_trophy_titles()
+        trophy_title_summaries = await self._psn_client.get_trophy_title_summaries()
+        trophy_titles = {comm_id: title.last_update for comm_id, title in trophy_title_summaries.items()}
+        self._update_unchanged_trophies(games_cids, trophy_title_summaries)
 
-        pending_cid_tids, pending_tid_cids, tid_trophies = self._process_trophies_cache(games_cids, trophy_titles)
+        pending_cid_tids, pending_tid_cids = self._process_trophies_cache(games_cids, trophy_titles)
 
         # process pending trophies
         requests = []
         for comm_id in pending_cid_tids.keys():
             timestamp = trophy_titles[comm_id]
             pending_tids = pending_cid_tids[comm_id]
-            requests.append(self._import_trophies(comm_id, pending_tids, pending_tid_cids, tid_trophies, timestamp))
+            requests.append(self._import_trophies(comm_id, pending_tids, pending_tid_cids, timestamp))
 
         await asyncio.gather(*requests)
 
@@ -261,32 +451,59 @@ class PSNPlugin(Plugin):
         if requests:
             try:
                 self.persistent_cache[TROPHIES_CACHE_KEY] = serialization.dumps(self._trophies_cache)
+                self.persistent_cache[TROPHY_GROUPS_CACHE_KEY] = serialization.dumps(self._trophy_groups_cache)
                 self.push_cache()
             except (pickle.PicklingError, binascii.Error):
                 logging.error("Can not serialize trophies cache")
 
         return trophy_titles
 
+    def _update_unchanged_trophies(
+        self,
+        games_cids: Dict[TitleId, Iterable[CommunicationId]],
+        trophy_title_summaries: Dict[CommunicationId, TrophyTitle]
+    ):
+        """Titles without earned trophies, or with as many as cached, are answered without fetching them"""
+        for comm_ids in games_cids.values():
+            for comm_id in comm_ids:
+                title = trophy_title_summaries.get(comm_id)
+                if title is None:
+                    continue
+                if not title.has_earned_trophies:
+                    self._trophies_cache.update(comm_id, EarnedTrophies(comm_id), title.last_update)
+                    self._trophy_groups_cache.update(comm_id, {}, title.last_update)
+                    continue
+                # earned trophies can not be lost, the same count means the same trophies
+                trophies = self._trophies_cache.peek(comm_id)
+                if trophies is not None and len(trophies) == title.earned_trophies:
+                    self._trophies_cache.update(comm_id, trophies, title.last_update)
+
     def _process_trophies_cache(
         self,
         games_cids: Dict[TitleId, Iterable[CommunicationId]],
         trophy_titles: TrophyTitles
-    ) -> Tuple[_CID_TIDS_DICT, _TID_CIDS_DICT, _TID_TROPHIES_DICT]:
+    ) -> Tuple[_CID_TIDS_DICT, _TID_CIDS_DICT]:
         pending_cid_tids: _CID_TIDS_DICT = defaultdict(set)
         pending_tid_cids: _TID_CIDS_DICT = defaultdict(set)
-        tid_trophies: _TID_TROPHIES_DICT = {}
 
         for title_id, comm_ids in games_cids.items():
 
-            game_trophies, pending_comm_ids = self._get_game_trophies_from_cache(comm_ids, trophy_titles)
+            pending_comm_ids = self._get_pending_comm_ids(comm_ids, trophy_titles)
 
             if pending_comm_ids:
                 for comm_id in pending_comm_ids:
                     pending_cid_tids[comm_id].add(title_id)
                 pending_tid_cids[title_id].update(pending_comm_ids)
-                tid_trophies[title_id] = game_trophies
 
-        return pending_cid_tids, pending_tid_cids, tid_trophies
+        return pending_cid_tids, pending_tid_cids
+
+    def _get_pending_comm_ids(self, game_comm_ids, trophy_titles) -> Set[CommunicationId]:
+        """Communication ids of the game without up to date trophies in the cache"""
+        return {
+            comm_id for comm_id in set(game_comm_ids)
+            if trophy_titles.get(comm_id) is not None
+            and self._trophies_cache.get(comm_id, trophy_titles[comm_id]) is None
+        }
 
     def _get_game_trophies_from_cache(self, game_comm_ids, trophy_titles):
         """Process all communication ids for the game"""
@@ -308,7 +525,6 @@ class PSNPlugin(Plugin):
         comm_id: CommunicationId,
         pending_tids: Set[TitleId],
         pending_tid_cids: _TID_CIDS_DICT,
-        tid_trophies: _TID_TROPHIES_DICT,
         timestamp: UnixTimestamp
     ):
         def handle_error(error_):
@@ -316,12 +532,11 @@ class PSNPlugin(Plugin):
                 del pending_tid_cids[tid_]
 
         try:
-            trophies: List[Achievement] = await self._psn_client.async_get_earned_trophies(comm_id)
+            trophies, trophy_groups = await self._get_earned_trophies(comm_id)
             self._trophies_cache.update(comm_id, trophies, timestamp)
+            self._trophy_groups_cache.update(comm_id, trophy_groups, timestamp)
             while pending_tids:
                 tid = pending_tids.pop()
-                game_trophies = tid_trophies[tid]
-                game_trophies.extend(trophies)
                 pending_comm_ids = pending_tid_cids[tid]
                 pending_comm_ids.remove(comm_id)
                 if not pending_comm_ids:
@@ -333,6 +548,33 @@ class PSNPlugin(Plugin):
             logging.exception("Unhandled exception. Please report it to the plugin developers")
             handle_error(UnknownError())
 
+    async def _get_earned_trophies(
+        self,
+        comm_id: CommunicationId
+    ) -> Tuple[Sequence[Achievement], Dict[TrophyGroupId, int]]:
+        """Refetches only the trophy groups with new earned trophies when the title was imported before"""
+        cached_trophies = self._trophies_cache.peek(comm_id)
+        cached_groups = self._trophy_groups_cache.peek(comm_id)
+        # trophies cached before they were kept as columns are fetched again
+        if not isinstance(cached_trophies, EarnedTrophies) or cached_groups is None:
+            trophies = await self._psn_client.async_get_earned_trophies(comm_id)
+            trophy_groups = Counter(group_id for group_id in trophies.group_ids if group_id is not None)
+            return trophies, dict(trophy_groups)
+
+        trophy_groups = await self._psn_client.async_get_trophy_groups(comm_id)
+        changed_groups = [
+            group_id for group_id, earned in trophy_groups.items()
+            if earned != cached_groups.get(group_id, 0)
+        ]
+        changed_trophies = await asyncio.gather(*[
+            self._psn_client.async_get_earned_trophies(comm_id, group_id) for group_id in changed_groups
+        ])
+        # earned trophies are never lost, the changed groups only add to the cached ones
+        trophies = cached_trophies
+        for group_trophies in changed_trophies:
+            trophies = trophies.merge(group_trophies)
+        return trophies, trophy_groups
+
     async def prepare_user_presence_context(self, user_ids: List[str]) -> Any:
         return await self._psn_client.async_get_friends_presences()
 
@@ -345,9 +587,25 @@ class PSNPlugin(Plugin):
     async def get_friends(self):
         return await self._psn_client.async_get_friends()
 
+    def _dump_http_stats(self):
+        self._next_http_stats_dump = time.monotonic() + HTTP_STATS_DUMP_INTERVAL
+        try:
+            self._request_stats.dump(self._http_stats_file)
+        except OSError:
+            logging.exception("Can not write request statistics")
+
+    def tick(self):
+        if self._http_stats_file and time.monotonic() >= self._next_http_stats_dump:
+            self._dump_http_stats()
+
     def shutdown(self):
+        if self._http_stats_file:
+            self._dump_http_stats()
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
         asyncio.create_task(self._http_client.logout())
         asyncio.create_task(self._store_http_client.logout())
+        asyncio.create_task(self._connection_pool.close())
 
     def handshake_complete(self):
         trophies_cache = self.persistent_cache.get(TROPHIES_CACHE_KEY)
@@ -357,25 +615,39 @@ class PSNPlugin(Plugin):
             except (pickle.UnpicklingError, binascii.Error):
                 logging.exception("Can not deserialize trophies cache")
 
+        trophy_groups_cache = self.persistent_cache.get(TROPHY_GROUPS_CACHE_KEY)
+        if trophy_groups_cache is not None:
+            try:
+                self._trophy_groups_cache = serialization.loads(trophy_groups_cache)
+            except (pickle.UnpicklingError, binascii.Error):
+                logging.exception("Can not deserialize trophy groups cache")
+
         comm_ids_cache = self.persistent_cache.get(COMMUNICATION_IDS_CACHE_KEY)
         if comm_ids_cache:
             try:
-                self.persistent_cache[COMMUNICATION_IDS_CACHE_KEY] = json.loads(comm_ids_cache)
-            except json.JSONDecodeError:
+                self.persistent_cache[COMMUNICATION_IDS_CACHE_KEY] = serialization.json_loads(comm_ids_cache)
+            except ValueError:
                 logging.exception("Can not deserialize communication ids cache")
 
         entitlements_cache = self.persistent_cache.get(ENTITLEMENTS_CACHE_KEY)
         if entitlements_cache:
             try:
-                self.persistent_cache[ENTITLEMENTS_CACHE_KEY] = json.loads(entitlements_cache)
-            except json.JSONDecodeError:
+                self.persistent_cache[ENTITLEMENTS_CACHE_KEY] = serialization.json_loads(entitlements_cache)
+            except ValueError:
                 logging.exception("Can not deserialize entitlements cache")
 
+        owned_games_cache = self.persistent_cache.get(OWNED_GAMES_CACHE_KEY)
+        if isinstance(owned_games_cache, str):
+            try:
+                self.persistent_cache[OWNED_GAMES_CACHE_KEY] = serialization.json_loads(owned_games_cache)
+            except ValueError:
+                logging.exception("Can not deserialize owned games cache")
+
         game_info_cache = self.persistent_cache.get(GAME_INFO_CACHE_KEY)
         if (game_info_cache):
             try:
-                self.persistent_cache[GAME_INFO_CACHE_KEY] = json.loads(game_info_cache)
-            except json.JSONDecodeError:
+                self.persistent_cache[GAME_INFO_CACHE_KEY] = serialization.json_loads(game_info_cache)
+            except ValueError:
                 logging.exception("Can not deserialize game info cache")
 
 
@@ -1,14 +1,25 @@
 import asyncio
+import contextvars
 import logging
-import unicodedata
-from datetime import datetime, timezone
-from functools import partial
-from typing import Dict, List, NewType, Tuple
+import re
+from collections import deque
+from datetime import date, datetime, timezone
+from functools import lru_cache, partial
+from itertools import takewhile
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, NewType, Optional, Sequence, Tuple
+
+try:
+    # optional, converts large batches of timestamps at once
+    import numpy
+except ImportError:
+    numpy = None
 
 from galaxy.api.errors import UnknownBackendResponse
 from galaxy.api.types import Achievement, Game, LicenseInfo, UserInfo, UserPresence, PresenceState
 from galaxy.api.consts import LicenseType
-from http_client import paginate_url, paginate_store_url
+from circuit_breaker import CircuitState
+from http_client import paginate_url, paginate_store_url, retry_budget
+from title_normalizer import longest_common_prefix, remove_unlock_suffixes
 
 # game_id_list is limited to 5 IDs per request
 GAME_DETAILS_URL = "https://pl-tpy.np.community.playstation.net/trophy/v1/apps/trophyTitles" \
@@ -38,6 +49,11 @@ EARNED_TROPHIES_PAGE = "https://pl-tpy.np.community.playstation.net/trophy/v1/"
     "&visibleType=1" \
     "&npLanguage=en"
 
+TROPHY_GROUPS_URL = "https://pl-tpy.np.community.playstation.net/trophy/v1/" \
+    "trophyTitles/{communication_id}/trophyGroups?" \
+    "fields=@default" \
+    "&npLanguage=en"
+
 USER_INFO_URL = "https://pl-prof.np.community.playstation.net/userProfile/v1/users/{user_id}/profile2" \
     "?fields=accountId,onlineId"
 
@@ -54,6 +70,21 @@ ENTITLEMENT_DETAILS_URL = "https://store.playstation.com/valkyrie-api/en/{countr
 PS3_SEARCH_URL = "https://store.playstation.com/valkyrie-api/en/{country}/19/faceted-search/{query}" \
     "?query=&platform=ps3&game_content_type=games&size=30&bucket=games&start=0"
 
+# request statistics are kept per template
+ENDPOINT_TEMPLATES = (
+    GAME_DETAILS_URL,
+    GAME_LIST_URL,
+    INTERNAL_ENTITLEMENTS_URL,
+    TROPHY_TITLES_URL,
+    EARNED_TROPHIES_PAGE,
+    TROPHY_GROUPS_URL,
+    USER_INFO_URL,
+    FRIENDS_URL,
+    FRIENDS_WITH_PRESENCE_URL,
+    ENTITLEMENT_DETAILS_URL,
+    PS3_SEARCH_URL
+)
+
 COUNTRIES = [
     # NA region country
     "US",
@@ -85,6 +116,18 @@ ENTITLEMENT_PLATFORM_IDS = [
 DEFAULT_LIMIT = 100
 MAX_TITLE_IDS_PER_REQUEST = 5
 MAX_ENTITLEMENTS_PER_REQUEST = 450
+# pages requested ahead of the one being consumed
+DEFAULT_PAGE_LOOKAHEAD = 4
+# parsed timestamps kept, earned dates repeat a lot within a title
+TIMESTAMP_CACHE_SIZE = 1024
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_TIMESTAMP_PATTERN = re.compile(r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z", re.ASCII)
+# below this many dates converting them with numpy costs more than it saves
+NUMPY_TIMESTAMPS_MIN_BATCH = 256
+# positions of the separators and digits in "YYYY-MM-DDTHH:MM:SSZ"
+_SEPARATOR_COLUMNS = [4, 7, 10, 13, 16, 19]
+_SEPARATOR_CODES = [ord(code) for code in "--T::Z"]
+_DIGIT_COLUMNS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
 
 CommunicationId = NewType("CommunicationId", str)
 TitleId = NewType("TitleId", str)
@@ -92,24 +135,178 @@ Entitlement = NewType("Entitlement", dict)
 GameInfo = NewType("GameInfo", dict)
 EntitlementId = NewType("EntitlementId", str)
 UnixTimestamp = NewType("UnixTimestamp", int)
+TrophyGroupId = NewType("TrophyGroupId", str)
 TrophyTitles = Dict[CommunicationId, UnixTimestamp]
 
-def parse_timestamp(earned_date) -> UnixTimestamp:
+
+class TrophyTitle(NamedTuple):
+    last_update: UnixTimestamp
+    # None when the backend does not report it
+    progress: Optional[int]
+    earned_trophies: Optional[int]
+
+    @property
+    def has_earned_trophies(self) -> bool:
+        # progress is weighted by grade and rounded, it can be 0 with a bronze trophy earned,
+        # only the earned count tells that nothing was earned
+        if self.earned_trophies is None:
+            return True
+        return self.earned_trophies > 0 or (self.progress or 0) > 0
+
+
+class OwnedGame(NamedTuple):
+    game: Game
+    last_played: Optional[UnixTimestamp]
+
+
+class EarnedTrophies(Sequence[Achievement]):
+    """Earned trophies of a title kept as columns, an Achievement is only created when it is accessed"""
+    def __init__(
+        self,
+        communication_id: CommunicationId,
+        trophy_ids: Sequence = (),
+        names: Sequence[str] = (),
+        unlock_times: Sequence[UnixTimestamp] = (),
+        group_ids: Sequence[Optional[TrophyGroupId]] = ()
+    ):
+        self._communication_id = communication_id
+        self._trophy_ids = trophy_ids
+        self._names = names
+        self._unlock_times = unlock_times
+        self._group_ids = group_ids
+
+    @property
+    def group_ids(self) -> Sequence[Optional[TrophyGroupId]]:
+        return self._group_ids
+
+    def merge(self, other: "EarnedTrophies") -> "EarnedTrophies":
+        """Union of the trophies of both, by trophy id, the ones of other replace the ones of self"""
+        if not other:
+            return self
+        replaced = set(other._trophy_ids)
+        kept = [i for i, trophy_id in enumerate(self._trophy_ids) if trophy_id not in replaced]
+
+        def merged(column, other_column) -> list:
+            return [column[i] for i in kept] + list(other_column)
+
+        return EarnedTrophies(
+            self._communication_id,
+            merged(self._trophy_ids, other._trophy_ids),
+            merged(self._names, other._names),
+            merged(self._unlock_times, other._unlock_times),
+            merged(self._group_ids, other._group_ids)
+        )
+
+    def __len__(self) -> int:
+        return len(self._trophy_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Achievement(
+            achievement_id="{}_{}".format(self._communication_id, self._trophy_ids[index]),
+            achievement_name=self._names[index],
+            unlock_time=self._unlock_times[index]
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return "EarnedTrophies({!r})".format(list(self))
+
+
+def count_earned_trophies(earned_trophies) -> Optional[int]:
+    """Sum of the per grade counts, None when they are not reported"""
+    if not isinstance(earned_trophies, dict):
+        return None
+    return sum(count for count in earned_trophies.values() if isinstance(count, int))
+
+
+def _strptime_timestamp(earned_date) -> UnixTimestamp:
     dt = datetime.strptime(earned_date, "%Y-%m-%dT%H:%M:%SZ")
     dt = datetime.combine(dt.date(), dt.time(), timezone.utc)
     return UnixTimestamp(dt.timestamp())
 
-def longest_common_prefix(s1, s2):
-    out = ''
-    s1test = s1.lstrip("The ")
-    s2test = s2.lstrip("The ")
-    s1test = unicodedata.normalize("NFKD", s1test.casefold())
-    s2test = unicodedata.normalize("NFKD", s2test.casefold())
-    for i, j, k in zip(s1test, s2test, s1):
-        if i != j:
-            break
-        out += k
-    return out
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_timestamp(earned_date: str) -> UnixTimestamp:
+    match = _TIMESTAMP_PATTERN.fullmatch(earned_date)
+    if match is not None:
+        year, month, day, hour, minute, second = map(int, match.groups())
+        if hour < 24 and minute < 60 and second < 60:
+            try:
+                days = date(year, month, day).toordinal() - _EPOCH_ORDINAL
+            except ValueError:
+                pass
+            else:
+                return UnixTimestamp(float(days * 86400 + hour * 3600 + minute * 60 + second))
+    # anything off the fixed layout is left to strptime, for the same result or error
+    return _strptime_timestamp(earned_date)
+
+
+def parse_timestamp(earned_date) -> UnixTimestamp:
+    if not isinstance(earned_date, str):
+        return _strptime_timestamp(earned_date)
+    return _parse_timestamp(earned_date)
+
+
+def _numpy_timestamps(earned_dates: List[str]) -> Optional[List[UnixTimestamp]]:
+    """All dates converted at once, None unless every one of them has the fixed layout and valid fields"""
+    dates = numpy.array(earned_dates)
+    if dates.dtype.kind != "U" or dates.dtype.itemsize != 4 * 20:
+        return None
+    codes = dates.view(numpy.uint32).reshape(-1, 20)
+    if not (codes[:, _SEPARATOR_COLUMNS] == _SEPARATOR_CODES).all():
+        return None
+    digits = codes[:, _DIGIT_COLUMNS].astype(numpy.int64) - ord("0")
+    if not ((digits >= 0) & (digits <= 9)).all():
+        return None
+    year, month, day, hour, minute, second = (
+        digits[:, start:stop] @ (10 ** numpy.arange(stop - start - 1, -1, -1))
+        for start, stop in ((0, 4), (4, 6), (6, 8), (8, 10), (10, 12), (12, 14))
+    )
+    if not ((year >= 1) & (month >= 1) & (month <= 12) & (hour < 24) & (minute < 60) & (second < 60)).all():
+        return None
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    first_days = months.astype("datetime64[D]").astype(numpy.int64)
+    month_lengths = (months + 1).astype("datetime64[D]").astype(numpy.int64) - first_days
+    if not ((day >= 1) & (day <= month_lengths)).all():
+        return None
+    days = first_days + day - 1
+    return (days * 86400 + hour * 3600 + minute * 60 + second).astype(numpy.float64).tolist()
+
+
+def parse_timestamps(earned_dates: Iterable[str]) -> List[UnixTimestamp]:
+    """Parses each distinct date of the batch once, however many of them the cache holds"""
+    earned_dates = list(earned_dates)
+    if numpy is not None and len(earned_dates) >= NUMPY_TIMESTAMPS_MIN_BATCH:
+        timestamps = _numpy_timestamps(earned_dates)
+        if timestamps is not None:
+            return timestamps
+
+    parsed: Dict[str, UnixTimestamp] = {}
+    timestamps = []
+    for earned_date in earned_dates:
+        timestamp = parsed.get(earned_date) if isinstance(earned_date, str) else None
+        if timestamp is None:
+            timestamp = parsed[earned_date] = parse_timestamp(earned_date)
+        timestamps.append(timestamp)
+    return timestamps
+
+
+def parse_last_played(last_played_date: Optional[str]) -> Optional[UnixTimestamp]:
+    if not last_played_date:
+        return None
+    for date_format in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            dt = datetime.strptime(last_played_date, date_format)
+        except ValueError:
+            continue
+        return UnixTimestamp(dt.replace(tzinfo=timezone.utc).timestamp())
+    return None
 
 
 class PSNClient:
@@ -117,39 +314,91 @@ class PSNClient:
         self._http_client = http_client
         self._store_http_client = store_http_client
 
+    @property
+    def is_store_available(self) -> bool:
+        """False while the circuit breaker of the store API is open"""
+        return self._store_http_client.circuit_state(ENTITLEMENT_DETAILS_URL) != CircuitState.Open
+
     @staticmethod
     async def _async(method, *args, **kwargs):
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, partial(method, *args, **kwargs))
 
-    async def fetch_paginated_data(
-        self,
-        parser,
-        url,
-        counter_name,
-        limit=DEFAULT_LIMIT,
-        *args,
-        **kwargs
-    ):
-        response = await self._http_client.get(paginate_url(url=url, limit=limit), *args, **kwargs)
+    @staticmethod
+    def _parse_page(parser, response):
+        try:
+            return parser(response)
+        except Exception:
+            logging.exception("Cannot parse data")
+            raise UnknownBackendResponse()
+
+    async def _stream_pages(self, http_client, page_url, parser, counter_name, limit, lookahead, *args, **kwargs):
+        response = await http_client.get(page_url(0), *args, **kwargs)
         if not response:
-            return []
+            return
 
         try:
             total = int(response.get(counter_name, 0))
         except ValueError:
             raise UnknownBackendResponse()
 
-        responses = [response] + await asyncio.gather(*[
-            self._http_client.get(paginate_url(url=url, limit=limit, offset=offset), *args, **kwargs)
-            for offset in range(limit, total, limit)
-        ])
+        # page requests share the retry budget, but consumers of the stream must not
+        with retry_budget():
+            context = contextvars.copy_context()
+
+        offsets = iter(range(limit, total, limit))
+        pending = deque()
+
+        def request_next_page() -> bool:
+            offset = next(offsets, None)
+            if offset is None:
+                return False
+            pending.append(context.run(
+                asyncio.ensure_future, http_client.get(page_url(offset), *args, **kwargs)
+            ))
+            return True
 
         try:
-            return [rec for res in responses for rec in parser(res)]
-        except Exception:
-            logging.exception("Cannot parse data")
-            raise UnknownBackendResponse()
+            for _ in range(lookahead):
+                request_next_page()
+            # the raw page is not kept while the consumer works on its records
+            records = self._parse_page(parser, response)
+            del response
+            yield records
+            while True:
+                # the page consumed next and up to lookahead pages after it
+                while len(pending) <= lookahead and request_next_page():
+                    pass
+                if not pending:
+                    break
+                response = await pending.popleft()
+                records = self._parse_page(parser, response)
+                del response
+                yield records
+        finally:
+            for task in pending:
+                if not task.cancel() and not task.cancelled():
+                    # finished already, do not leave its error unretrieved
+                    task.exception()
+
+    def stream_paginated_data(
+        self,
+        parser,
+        url,
+        counter_name,
+        limit=DEFAULT_LIMIT,
+        *args,
+        lookahead=DEFAULT_PAGE_LOOKAHEAD,
+        **kwargs
+    ) -> AsyncIterator[List]:
+        """Parsed records of one page at a time, in page order, with up to `lookahead` pages requested ahead"""
+        return self._stream_pages(
+            self._http_client, lambda offset: paginate_url(url=url, limit=limit, offset=offset),
+            parser, counter_name, limit, lookahead, *args, **kwargs
+        )
+
+    async def fetch_paginated_data(self, *args, **kwargs):
+        return [rec async for records in self.stream_paginated_data(*args, **kwargs) for rec in records]
 
     async def fetch_data(self, parser, *args, **kwargs):
         response = await self._http_client.get(*args, **kwargs)
@@ -160,34 +409,23 @@ class PSNClient:
             logging.exception("Cannot parse data")
             raise UnknownBackendResponse()
 
-    async def fetch_paginated_store_data(
+    def stream_paginated_store_data(
         self,
         parser,
         url,
         counter_name,
         limit=MAX_ENTITLEMENTS_PER_REQUEST,
         *args,
+        lookahead=DEFAULT_PAGE_LOOKAHEAD,
         **kwargs
-    ):
-        response = await self._store_http_client.get(paginate_store_url(url=url, size=limit), *args, **kwargs)
-        if not response:
-            return []
-
-        try:
-            total = int(response.get(counter_name, 0))
-        except ValueError:
-            raise UnknownBackendResponse()
-
-        responses = [response] + await asyncio.gather(*[
-            self._store_http_client.get(paginate_store_url(url=url, size=limit, start=offset), *args, **kwargs)
-            for offset in range(limit, total, limit)
-        ])
+    ) -> AsyncIterator[List]:
+        return self._stream_pages(
+            self._store_http_client, lambda offset: paginate_store_url(url=url, size=limit, start=offset),
+            parser, counter_name, limit, lookahead, *args, **kwargs
+        )
 
-        try:
-            return [rec for res in responses for rec in parser(res)]
-        except Exception:
-            logging.exception("Cannot parse data")
-            raise UnknownBackendResponse()
+    async def fetch_paginated_store_data(self, *args, **kwargs):
+        return [rec async for records in self.stream_paginated_store_data(*args, **kwargs) for rec in records]
 
     async def fetch_store_data(self, parser, *args, **kwargs):
         response = await self._store_http_client.get(*args, **kwargs)
@@ -207,13 +445,20 @@ class PSNClient:
             USER_INFO_URL.format(user_id="me")
         )
 
-    async def async_get_owned_games(self):
+    async def async_stream_owned_games(self, played_after: Optional[UnixTimestamp] = None) \
+            -> AsyncIterator[List[OwnedGame]]:
+        """Game list pages, most recently played first.
+        With played_after only titles played since, or never played, are yielded and paging stops
+        at the first title played before."""
         def game_parser(title):
-            return Game(
-                game_id=title["titleId"],
-                game_title=title["name"],
-                dlcs=[],
-                license_info=LicenseInfo(LicenseType.SinglePurchase, None)
+            return OwnedGame(
+                game=Game(
+                    game_id=title["titleId"],
+                    game_title=title["name"],
+                    dlcs=[],
+                    license_info=LicenseInfo(LicenseType.SinglePurchase, None)
+                ),
+                last_played=parse_last_played(title.get("lastPlayedDate"))
             )
 
         def games_parser(response):
@@ -221,11 +466,36 @@ class PSNClient:
                game_parser(title) for title in response["titles"]
             ] if response else []
 
-        return await self.fetch_paginated_data(
+        def played_since(owned_game):
+            # titles never played have no date wherever the backend sorts them, they do not end the paging
+            return owned_game.last_played is None or owned_game.last_played > played_after
+
+        pages = self.stream_paginated_data(
             games_parser,
             GAME_LIST_URL.format(user_id="me"),
-            "totalResults"
+            "totalResults",
+            revalidate=True,
+            # usually the first page is all that is needed
+            lookahead=DEFAULT_PAGE_LOOKAHEAD if played_after is None else 0
         )
+        try:
+            async for owned_games in pages:
+                if played_after is None:
+                    yield owned_games
+                    continue
+                recent = list(takewhile(played_since, owned_games))
+                yield recent
+                if len(recent) < len(owned_games):
+                    break
+        finally:
+            await pages.aclose()
+
+    async def async_get_owned_games(self):
+        return [
+            owned_game.game
+            async for owned_games in self.async_stream_owned_games()
+            for owned_game in owned_games
+        ]
 
     async def async_get_game_communication_id_map(self, game_ids: List[TitleId]) \
             -> Dict[TitleId, List[CommunicationId]]:
@@ -248,7 +518,9 @@ class PSNClient:
 
         mapping = await self.fetch_data(
             communication_ids_parser,
-            GAME_DETAILS_URL.format(game_id_list=",".join(game_ids))
+            GAME_DETAILS_URL.format(game_id_list=",".join(game_ids)),
+            # concurrent library settings and achievements calls resolve the same titles
+            coalesce=True
         )
 
         return {
@@ -256,7 +528,7 @@ class PSNClient:
             for game_id in game_ids
         }
 
-    async def async_get_owned_ps3_entitlements(self):
+    def async_stream_owned_ps3_entitlements(self) -> AsyncIterator[List[Entitlement]]:
         def ps3_entitlements(entitlement):
             return "drm_def" in entitlement \
                 and entitlement["drm_def"]["drmContents"][0]["platformIds"] in ENTITLEMENT_PLATFORM_IDS \
@@ -275,12 +547,19 @@ class PSNClient:
                 ps3_title_parser(title) for title in filter(ps3_entitlements, response["entitlements"])
             ] if response and "entitlements" in response else []
 
-        return await self.fetch_paginated_store_data(
+        return self.stream_paginated_store_data(
             entitlements_parser,
             INTERNAL_ENTITLEMENTS_URL.format(user_id="me"),
             "total_results"
         )
 
+    async def async_get_owned_ps3_entitlements(self):
+        return [
+            entitlement
+            async for entitlements in self.async_stream_owned_ps3_entitlements()
+            for entitlement in entitlements
+        ]
+
     async def async_get_game_info(self, entitlement: Entitlement) -> GameInfo:
         def game_info_parser(response):
             try:
@@ -317,9 +596,11 @@ class PSNClient:
         for country in COUNTRIES:
             try:
                 name = " ".join(entitlement["content_name"].split(" ")[-3:])
+                # entitlements ending with the same three words search for the same name
                 result = await self.fetch_store_data(
                     search_parser,
-                    PS3_SEARCH_URL.format(query=name,country=country)
+                    PS3_SEARCH_URL.format(query=name,country=country),
+                    coalesce=True
                 )
                 if not(result):
                     result = await self.fetch_store_data(
@@ -331,22 +612,25 @@ class PSNClient:
             break
 
         if result:
-            result["title"] = result["title"] \
-                .replace("Full Game Unlock", "") \
-                .replace("- Full Game", "") \
-                .replace("– Full Game", "") \
-                .replace("Full Game", "") \
-                .replace("full game", "") \
-                .replace("Unlock", "") \
-                .strip()
+            result["title"] = remove_unlock_suffixes(result["title"])
 
         return result
 
     async def get_trophy_titles(self) -> TrophyTitles:
-        def title_parser(title) -> Tuple[CommunicationId, UnixTimestamp]:
-            return (title["npCommunicationId"], parse_timestamp((title.get("fromUser") or {})["lastUpdateDate"]))
-
-        def titles_parser(response) -> List[Tuple[CommunicationId, UnixTimestamp]]:
+        titles = await self.get_trophy_title_summaries()
+        return {comm_id: title.last_update for comm_id, title in titles.items()}
+
+    async def get_trophy_title_summaries(self) -> Dict[CommunicationId, TrophyTitle]:
+        def title_parser(title) -> Tuple[CommunicationId, TrophyTitle]:
+            from_user = title.get("fromUser") or {}
+            progress = from_user.get("progress")
+            return (title["npCommunicationId"], TrophyTitle(
+                last_update=parse_timestamp(from_user["lastUpdateDate"]),
+                progress=progress if isinstance(progress, int) else None,
+                earned_trophies=count_earned_trophies(from_user.get("earnedTrophies"))
+            ))
+
+        def titles_parser(response) -> List[Tuple[CommunicationId, TrophyTitle]]:
             return [
                 title_parser(title) for title in response.get("trophyTitles", [])
             ] if response else []
@@ -354,27 +638,43 @@ class PSNClient:
         result = await self.fetch_paginated_data(
             parser=titles_parser,
             url=TROPHY_TITLES_URL,
-            counter_name="totalResults"
+            counter_name="totalResults",
+            revalidate=True
         )
         return dict(result)
 
-    async def async_get_earned_trophies(self, communication_id) -> List[Achievement]:
-        def trophy_parser(trophy) -> Achievement:
-            return Achievement(
-                achievement_id="{}_{}".format(communication_id, trophy["trophyId"]),
-                achievement_name=str(trophy["trophyName"]),
-                unlock_time=parse_timestamp(trophy["fromUser"]["earnedDate"])
-            )
-
-        def trophies_parser(response) -> List[Achievement]:
-            return [
-                trophy_parser(trophy) for trophy in response.get("trophies", [])
-                if trophy.get("fromUser") and trophy["fromUser"].get("earned")
-            ] if response else []
+    async def async_get_trophy_groups(self, communication_id) -> Dict[TrophyGroupId, int]:
+        """Earned trophies per trophy group"""
+        def group_parser(group) -> Tuple[TrophyGroupId, int]:
+            earned_trophies = count_earned_trophies((group.get("fromUser") or {}).get("earnedTrophies"))
+            return group["trophyGroupId"], earned_trophies or 0
 
+        def groups_parser(response) -> Dict[TrophyGroupId, int]:
+            return dict(
+                group_parser(group) for group in response.get("trophyGroups", [])
+            ) if response else {}
+
+        return await self.fetch_data(groups_parser, TROPHY_GROUPS_URL.format(communication_id=communication_id))
+
+    async def async_get_earned_trophies(self, communication_id, trophy_group_id="all") -> EarnedTrophies:
+        def trophies_parser(response) -> EarnedTrophies:
+            if not response:
+                return EarnedTrophies(communication_id)
+            # one pass collecting the columns, the timestamps are converted together
+            trophy_ids, names, earned_dates, group_ids = [], [], [], []
+            for trophy in response.get("trophies", []):
+                from_user = trophy.get("fromUser")
+                if from_user and from_user.get("earned"):
+                    trophy_ids.append(trophy["trophyId"])
+                    names.append(str(trophy["trophyName"]))
+                    earned_dates.append(from_user["earnedDate"])
+                    group_ids.append(trophy.get("groupId"))
+            return EarnedTrophies(communication_id, trophy_ids, names, parse_timestamps(earned_dates), group_ids)
+
+        # one slow title holds up the whole achievements import
         return await self.fetch_data(trophies_parser, EARNED_TROPHIES_PAGE.format(
             communication_id=communication_id,
-            trophy_group_id="all"))
+            trophy_group_id=trophy_group_id), hedge=True)
 
     async def async_get_friends(self):
         def friend_info_parser(profile):
@@ -399,7 +699,8 @@ class PSNClient:
         return await self.fetch_paginated_data(
             friend_list_parser,
             FRIENDS_URL.format(user_id="me", avatar_size_list=DEFAULT_AVATAR_SIZE),
-            "totalResults"
+            "totalResults",
+            revalidate=True
         )
 
     async def async_get_friends_presences(self):
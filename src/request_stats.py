@@ -0,0 +1,87 @@
+import copy
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+from urllib.parse import urlsplit
+
+# upper bounds of the histogram buckets, the last bucket counts everything above
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+
+_PLACEHOLDER = re.compile(r"\{\w+\}")
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    retries: int = 0
+    # by HTTP status, or by error name when there was no response
+    statuses: Dict[str, int] = field(default_factory=dict)
+    latency_histogram: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    size_histogram: List[int] = field(default_factory=lambda: [0] * (len(SIZE_BUCKETS) + 1))
+    response_bytes: int = 0
+    max_response_bytes: int = 0
+
+
+def compile_template(template: str) -> Pattern:
+    """Matches the URLs formatted from a template, including added pagination parameters"""
+    pattern = ".*?".join(re.escape(part) for part in _PLACEHOLDER.split(template))
+    return re.compile(pattern + "(&.*)?")
+
+
+class RequestStats:
+    """Request statistics keyed by URL template, URLs not matching any template are keyed by host"""
+    def __init__(self, templates: Iterable[str] = ()):
+        self._templates: List[Tuple[str, Pattern]] = [
+            (template, compile_template(template)) for template in templates
+        ]
+        self._endpoints: Dict[str, EndpointStats] = {}
+
+    def endpoint(self, url: str) -> str:
+        for template, pattern in self._templates:
+            if pattern.fullmatch(url):
+                return template
+        return urlsplit(url).hostname or ""
+
+    def _get(self, url: str) -> EndpointStats:
+        return self._endpoints.setdefault(self.endpoint(url), EndpointStats())
+
+    def record_response(self, url: str, status: str, latency: float, size: Optional[int] = None):
+        stats = self._get(url)
+        stats.requests += 1
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        stats.total_latency += latency
+        stats.max_latency = max(stats.max_latency, latency)
+        if size is not None:
+            stats.size_histogram[bisect_left(SIZE_BUCKETS, size)] += 1
+            stats.response_bytes += size
+            stats.max_response_bytes = max(stats.max_response_bytes, size)
+
+    def record_retry(self, url: str):
+        self._get(url).retries += 1
+
+    @property
+    def endpoints(self) -> Dict[str, EndpointStats]:
+        return copy.deepcopy(self._endpoints)
+
+    def to_json(self) -> Dict:
+        return {
+            "time": time.time(),
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "size_buckets": list(SIZE_BUCKETS),
+            "endpoints": {endpoint: asdict(stats) for endpoint, stats in self._endpoints.items()}
+        }
+
+    def dump(self, path: str):
+        # replace the file at once, so readers never see a partial dump
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file_:
+            json.dump(self.to_json(), file_, indent=2)
+        os.replace(temporary_path, path)
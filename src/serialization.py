@@ -1,8 +1,45 @@
 import base64
+import importlib
+import json
 import pickle
 
+# tried in this order, the first installed one decodes all JSON
+JSON_DECODERS = ("orjson", "ujson", "json")
+
+_json_decoder = json.loads
+json_decoder_name = "json"
+
+
 def loads(s):
     return pickle.loads(base64.decodebytes(s.encode()))
 
 def dumps(obj):
     return base64.encodebytes(pickle.dumps(obj)).decode()
+
+
+def use_json_decoder(name=None):
+    """Selects the JSON decoder module by name, or the first installed one of JSON_DECODERS"""
+    global _json_decoder, json_decoder_name
+    for candidate in (name,) if name else JSON_DECODERS:
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        _json_decoder = module.loads
+        json_decoder_name = candidate
+        return candidate
+
+def json_loads(data):
+    """Decodes str or utf-8 bytes, raises ValueError for invalid JSON"""
+    try:
+        return _json_decoder(data)
+    except ValueError:
+        if _json_decoder is json.loads:
+            raise
+        # the stdlib decoder is more lenient (NaN, integers above 64 bits), keep accepting what it accepts
+        return json.loads(data)
+
+
+use_json_decoder()
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from fnmatch import fnmatch
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# maximum number of simultaneous requests per backend host
+HOST_CONCURRENCY_LIMITS = {
+    # trophy API
+    "pl-tpy.np.community.playstation.net": 8,
+    # game list
+    "gamelist.api.playstation.com": 4,
+    # commerce (internal entitlements)
+    "commerce.api.np.km.playstation.net": 4,
+    # valkyrie store API
+    "store.playstation.com": 6
+}
+
+DEFAULT_CONCURRENCY_LIMIT = 8
+
+
+@dataclass
+class ConcurrencyStats:
+    in_flight: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    acquired: int = 0
+    waited: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+
+class ConcurrencyLimiter:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        default_limit: int = DEFAULT_CONCURRENCY_LIMIT
+    ):
+        self._limits = dict(HOST_CONCURRENCY_LIMITS if limits is None else limits)
+        self._default_limit = default_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, ConcurrencyStats] = {}
+
+    def limit(self, host: str) -> int:
+        return self._limits.get(host, self._default_limit)
+
+    @property
+    def stats(self) -> Dict[str, ConcurrencyStats]:
+        return {host: replace(stats) for host, stats in self._stats.items()}
+
+    def _get_semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.limit(host))
+        return semaphore
+
+    def available(self, url: str) -> bool:
+        """Whether a slot for the host of url is free right now"""
+        semaphore = self._semaphores.get(urlsplit(url).hostname or "")
+        return semaphore is None or not semaphore.locked()
+
+    @asynccontextmanager
+    async def acquire(self, url: str):
+        host = urlsplit(url).hostname or ""
+        semaphore = self._get_semaphore(host)
+        stats = self._stats.setdefault(host, ConcurrencyStats())
+
+        contended = semaphore.locked()
+        start = time.monotonic()
+        if contended:
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            if contended:
+                stats.queued -= 1
+
+        stats.acquired += 1
+        stats.in_flight += 1
+        if contended:
+            wait_time = time.monotonic() - start
+            stats.waited += 1
+            stats.total_wait_time += wait_time
+            stats.max_wait_time = max(stats.max_wait_time, wait_time)
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            semaphore.release()
+
+
+@dataclass
+class RateLimit:
+    # sustained requests per second
+    rate: float
+    # requests that can be sent in a burst
+    capacity: float
+
+
+# PSN throttles these endpoint families separately
+ENDPOINT_FAMILIES = {
+    "trophy": ("pl-tpy.np.community.playstation.net",),
+    "profile": ("*-prof.np.community.playstation.net",),
+    "store": ("store.playstation.com",)
+}
+
+ENDPOINT_FAMILY_RATE_LIMITS = {
+    "trophy": RateLimit(rate=10, capacity=20),
+    "profile": RateLimit(rate=5, capacity=10),
+    "store": RateLimit(rate=5, capacity=10)
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self):
+        # take the token up front (possibly going into debt), waiters are served in arrival order
+        self._refill()
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self._rate)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, RateLimit]] = None,
+        families: Optional[Dict[str, Tuple[str, ...]]] = None
+    ):
+        limits = ENDPOINT_FAMILY_RATE_LIMITS if limits is None else limits
+        self._families = ENDPOINT_FAMILIES if families is None else families
+        self._buckets = {
+            family: TokenBucket(limit.rate, limit.capacity) for family, limit in limits.items()
+        }
+        self._host_families: Dict[str, Optional[str]] = {}
+
+    def _get_family(self, host: str) -> Optional[str]:
+        if host not in self._host_families:
+            self._host_families[host] = next((
+                family for family, patterns in self._families.items()
+                if family in self._buckets and any(fnmatch(host, pattern) for pattern in patterns)
+            ), None)
+        return self._host_families[host]
+
+    @property
+    def levels(self) -> Dict[str, float]:
+        return {family: bucket.level for family, bucket in self._buckets.items()}
+
+    def available(self, url: str) -> bool:
+        """Whether a request to url can be sent right now without waiting for a token"""
+        family = self._get_family(urlsplit(url).hostname or "")
+        return family is None or self._buckets[family].level >= 1
+
+    async def acquire(self, url: str):
+        family = self._get_family(urlsplit(url).hostname or "")
+        if family is not None:
+            await self._buckets[family].acquire()
@@ -0,0 +1,80 @@
+import re
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import NamedTuple, Tuple
+
+# normalized names kept, the same entitlement names are compared on every game info lookup
+NORMALIZED_NAMES_CACHE_SIZE = 4096
+
+# leading article ignored when comparing names
+_ARTICLE_PATTERN = re.compile(r"the\s+", re.IGNORECASE)
+# what the store adds to the names of unlock keys, the dashed forms first so that no dash is left behind
+_UNLOCK_SUFFIX_PATTERN = re.compile(r"[-–] Full Game|Full Game Unlock|Full Game|full game|Unlock")
+
+
+class NormalizedName(NamedTuple):
+    # leading article as written, kept in titles
+    article: str
+    chars: str
+    # compatibility caseless form of the chars, "™" is "tm" and not "TM"
+    text: str
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKD", unicodedata.normalize("NFKD", text).casefold())
+
+
+@lru_cache(maxsize=None)
+def _normalize_char(char: str) -> str:
+    return _normalize(char)
+
+
+@lru_cache(maxsize=NORMALIZED_NAMES_CACHE_SIZE)
+def normalize_name(name: str) -> NormalizedName:
+    match = _ARTICLE_PATTERN.match(name)
+    article = match.group() if match else ""
+    chars = name[len(article):]
+    return NormalizedName(article, chars, chars.lower() if chars.isascii() else _normalize(chars))
+
+
+@lru_cache(maxsize=NORMALIZED_NAMES_CACHE_SIZE)
+def _form_ends(chars: str) -> Tuple[int, ...]:
+    """End of the form of each char in the normalized text"""
+    return tuple(accumulate(len(_normalize_char(char)) for char in chars))
+
+
+def _common_prefix_length(text: str, other: str) -> int:
+    low, high = 0, min(len(text), len(other))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if other.startswith(text[low:middle], low):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def longest_common_prefix(name: str, other: str) -> str:
+    """Prefix of name matching other, ignoring case, compatibility forms and a leading "The" in either of them"""
+    normalized = normalize_name(name)
+    matched = _common_prefix_length(normalized.text, normalize_name(other).text)
+    if matched == len(normalized.text):
+        length = len(normalized.chars)
+    elif len(normalized.text) == len(normalized.chars):
+        # forms never shrink, the same length means a single char form per char
+        length = matched
+    else:
+        # only chars whose whole form matched
+        length = bisect_right(_form_ends(normalized.chars), matched)
+    if not length:
+        return ""
+    return normalized.article + normalized.chars[:length]
+
+
+def remove_unlock_suffixes(title: str) -> str:
+    # most names have none of the suffixes, the plain substring checks are cheaper than the pattern
+    if "Full Game" in title or "full game" in title or "Unlock" in title:
+        title = _UNLOCK_SUFFIX_PATTERN.sub("", title)
+    return title.strip()
@@ -6,6 +6,11 @@ from http_client import AuthenticatedHttpClient
 from tests.async_mock import AsyncMock
 
 
+@pytest.fixture(autouse=True)
+def no_connection_warm_up(mocker):
+    mocker.patch("plugin.WARM_UP_URLS", [])
+
+
 @pytest.fixture()
 def access_token():
     return "access_token"
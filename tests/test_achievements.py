@@ -1,8 +1,10 @@
 import asyncio
 import pytest
+import serialization
 from galaxy.api.errors import AuthenticationRequired, UnknownBackendResponse
 from plugin import ENTITLEMENTS_CACHE_KEY
-from psn_client import EARNED_TROPHIES_PAGE
+from galaxy.api.types import Achievement
+from psn_client import EARNED_TROPHIES_PAGE, TROPHY_GROUPS_URL, EarnedTrophies, TrophyTitle
 from tests.async_mock import AsyncMock
 from unittest.mock import MagicMock
 from tests.test_data import COMMUNICATION_ID, ALL_GAMES, TITLE_TO_COMMUNICATION_ID, ENTITLEMENTS_CACHE, UNLOCKED_ACHIEVEMENTS, CONTEXT, TROPHIES_CACHE, BACKEND_TROPHIES
@@ -46,6 +48,10 @@ def mock_async_get_game_communication_id_map(mocker):
 def mock_async_get_earned_trophies(mocker):
     return mocker.patch("plugin.PSNClient.async_get_earned_trophies", new_callable=AsyncMock)
 
+@pytest.fixture
+def mock_async_get_trophy_groups(mocker):
+    return mocker.patch("plugin.PSNClient.async_get_trophy_groups", new_callable=AsyncMock)
+
 @pytest.fixture
 def mock_get_trophy_titles(mocker):
     return mocker.patch("plugin.PSNClient.get_trophy_titles", new_callable=AsyncMock)
@@ -122,7 +128,7 @@ async def test_async_get_earned_trophies(
 
     assert trophies == await authenticated_psn_client.async_get_earned_trophies(COMMUNICATION_ID)
 
-    http_get.assert_called_once_with(GET_ALL_TROPHIES_URL)
+    http_get.assert_called_once_with(GET_ALL_TROPHIES_URL, hedge=True)
 
 
 @pytest.mark.asyncio
@@ -174,7 +180,7 @@ async def test_async_get_earned_trophies_bad_format(
     with pytest.raises(UnknownBackendResponse):
         await authenticated_psn_client.async_get_earned_trophies(COMMUNICATION_ID)
 
-    http_get.assert_called_once_with(GET_ALL_TROPHIES_URL)
+    http_get.assert_called_once_with(GET_ALL_TROPHIES_URL, hedge=True)
 
 
 TROPHY_TITLES = {
@@ -246,3 +252,247 @@ async def test_get_trophy_titles_bad_format(
         await authenticated_psn_client.get_trophy_titles()
 
     http_get.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_trophy_title_summaries(http_get, authenticated_psn_client):
+    http_get.return_value = {
+        "totalResults": 3,
+        "trophyTitles": [
+            {
+                "npCommunicationId": "NPWR12784_00",
+                "fromUser": {
+                    "progress": 4,
+                    "earnedTrophies": {"bronze": 2, "silver": 1, "gold": 0, "platinum": 0},
+                    "lastUpdateDate": "2018-06-08T13:22:23Z"
+                }
+            },
+            {
+                "npCommunicationId": "NPWR11243_00",
+                "fromUser": {
+                    "progress": 0,
+                    "earnedTrophies": {"bronze": 0, "silver": 0, "gold": 0, "platinum": 0},
+                    "lastUpdateDate": "2018-03-28T19:29:51Z"
+                }
+            },
+            {"npCommunicationId": "NPWR07882_00", "fromUser": {"lastUpdateDate": "2018-03-28T11:27:21Z"}}
+        ]
+    }
+
+    assert {
+        "NPWR12784_00": TrophyTitle(1528464143, 4, 3),
+        "NPWR11243_00": TrophyTitle(1522265391, 0, 0),
+        "NPWR07882_00": TrophyTitle(1522236441, None, None)
+    } == await authenticated_psn_client.get_trophy_title_summaries()
+
+
+@pytest.mark.parametrize("title, has_earned_trophies", [
+    (TrophyTitle(1, 4, 3), True),
+    (TrophyTitle(1, 0, 1), True),
+    (TrophyTitle(1, 0, 0), False),
+    (TrophyTitle(1, 0, None), True),
+    (TrophyTitle(1, 5, 0), True),
+    (TrophyTitle(1, None, None), True)
+])
+def test_trophy_title_has_earned_trophies(title, has_earned_trophies):
+    assert title.has_earned_trophies == has_earned_trophies
+
+
+@pytest.mark.asyncio
+async def test_prepare_achievements_context_fetches_changed_titles_only(
+    authenticated_plugin,
+    mocker,
+    mock_async_get_earned_trophies
+):
+    _mock_get_game_communication_ids(mocker, {
+        "CUSA00001_00": ["NPWR00001_00"],
+        "CUSA00002_00": ["NPWR00002_00"],
+        "CUSA00003_00": ["NPWR00003_00"]
+    })
+    mocker.patch("plugin.PSNClient.get_trophy_title_summaries", new_callable=AsyncMock, return_value={
+        "NPWR00001_00": TrophyTitle(1600000000, 0, 0),
+        "NPWR00002_00": TrophyTitle(1600000000, 10, 2),
+        "NPWR00003_00": TrophyTitle(1600000000, 20, 3)
+    })
+    cached = UNLOCKED_ACHIEVEMENTS[:2]
+    authenticated_plugin._trophies_cache.update("NPWR00002_00", cached, 1500000000)
+    authenticated_plugin._trophies_cache.update("NPWR00003_00", cached, 1500000000)
+    fetched = EarnedTrophies("NPWR00003_00", [1, 2, 3], ["ach1", "ach2", "ach3"], [1.0, 2.0, 3.0], ["default"] * 3)
+    mock_async_get_earned_trophies.return_value = fetched
+
+    context = await authenticated_plugin.prepare_achievements_context(
+        ["CUSA00001_00", "CUSA00002_00", "CUSA00003_00"]
+    )
+
+    mock_async_get_earned_trophies.assert_called_once_with("NPWR00003_00")
+    assert context == {"NPWR00001_00": 1600000000, "NPWR00002_00": 1600000000, "NPWR00003_00": 1600000000}
+    assert authenticated_plugin._get_game_trophies_from_cache(["NPWR00001_00"], context) == ([], set())
+    assert authenticated_plugin._get_game_trophies_from_cache(["NPWR00002_00"], context) == (cached, set())
+    assert authenticated_plugin._get_game_trophies_from_cache(["NPWR00003_00"], context) == (list(fetched), set())
+
+
+@pytest.mark.asyncio
+async def test_async_get_trophy_groups(http_get, authenticated_psn_client):
+    http_get.return_value = {
+        "trophyGroups": [
+            {
+                "trophyGroupId": "default",
+                "fromUser": {"progress": 12, "earnedTrophies": {"bronze": 4, "silver": 1, "gold": 0, "platinum": 0}}
+            },
+            {"trophyGroupId": "001", "fromUser": {"progress": 0, "earnedTrophies": {}}},
+            {"trophyGroupId": "002"}
+        ]
+    }
+
+    assert {"default": 5, "001": 0, "002": 0} == \
+        await authenticated_psn_client.async_get_trophy_groups(COMMUNICATION_ID)
+
+    http_get.assert_called_once_with(TROPHY_GROUPS_URL.format(communication_id=COMMUNICATION_ID))
+
+
+@pytest.mark.asyncio
+async def test_async_get_earned_trophies_groups(http_get, authenticated_psn_client):
+    http_get.return_value = {
+        "trophies": [
+            {
+                "trophyId": 1, "trophyName": "ach1", "groupId": "default",
+                "fromUser": {"onlineId": "user-id", "earned": True, "earnedDate": "1987-02-07T10:14:42Z"}
+            },
+            {
+                "trophyId": 2, "trophyName": "ach2", "groupId": "001",
+                "fromUser": {"onlineId": "user-id", "earned": False}
+            }
+        ]
+    }
+
+    trophies = await authenticated_psn_client.async_get_earned_trophies(COMMUNICATION_ID)
+
+    assert [Achievement(achievement_id=COMMUNICATION_ID + "_1", achievement_name="ach1", unlock_time=539691282)] == trophies
+    assert ["default"] == trophies.group_ids
+
+
+@pytest.mark.asyncio
+async def test_prepare_achievements_context_fetches_changed_trophy_groups_only(
+    authenticated_plugin,
+    mocker,
+    mock_async_get_earned_trophies,
+    mock_async_get_trophy_groups
+):
+    _mock_get_game_communication_ids(mocker, {GAME_ID: [COMMUNICATION_ID]})
+    mocker.patch("plugin.PSNClient.get_trophy_title_summaries", new_callable=AsyncMock, return_value={
+        COMMUNICATION_ID: TrophyTitle(1600000000, 30, 3)
+    })
+    cached = EarnedTrophies(COMMUNICATION_ID, [1, 42], ["ach1", "ach42"], [1500000000] * 2, ["default", "001"])
+    fetched = EarnedTrophies(COMMUNICATION_ID, [42, 43], ["ach42", "ach43"], [1500000000, 1600000000], ["001"] * 2)
+    authenticated_plugin._trophies_cache.update(COMMUNICATION_ID, cached, 1500000000)
+    authenticated_plugin._trophy_groups_cache.update(COMMUNICATION_ID, {"default": 1, "001": 1}, 1500000000)
+    mock_async_get_trophy_groups.return_value = {"default": 1, "001": 2, "002": 0}
+    mock_async_get_earned_trophies.return_value = fetched
+
+    await authenticated_plugin.prepare_achievements_context([GAME_ID])
+
+    mock_async_get_earned_trophies.assert_called_once_with(COMMUNICATION_ID, "001")
+    trophies = authenticated_plugin._trophies_cache.get(COMMUNICATION_ID, 1600000000)
+    assert isinstance(trophies, EarnedTrophies)
+    assert [
+        Achievement(achievement_id=COMMUNICATION_ID + "_1", achievement_name="ach1", unlock_time=1500000000),
+        Achievement(achievement_id=COMMUNICATION_ID + "_42", achievement_name="ach42", unlock_time=1500000000),
+        Achievement(achievement_id=COMMUNICATION_ID + "_43", achievement_name="ach43", unlock_time=1600000000)
+    ] == trophies
+    assert ["default", "001", "001"] == trophies.group_ids
+    assert authenticated_plugin._trophy_groups_cache.get(COMMUNICATION_ID, 1600000000) == \
+        {"default": 1, "001": 2, "002": 0}
+
+
+@pytest.mark.asyncio
+async def test_prepare_achievements_context_keeps_trophies_of_unchanged_groups(
+    authenticated_plugin,
+    mocker,
+    mock_async_get_earned_trophies,
+    mock_async_get_trophy_groups
+):
+    _mock_get_game_communication_ids(mocker, {GAME_ID: [COMMUNICATION_ID]})
+    mocker.patch("plugin.PSNClient.get_trophy_title_summaries", new_callable=AsyncMock, return_value={
+        COMMUNICATION_ID: TrophyTitle(1600000000, 30, 3)
+    })
+    cached = EarnedTrophies(COMMUNICATION_ID, [1, 42], ["ach1", "ach42"], [1500000000] * 2, ["default", "001"])
+    authenticated_plugin._trophies_cache.update(COMMUNICATION_ID, cached, 1500000000)
+    authenticated_plugin._trophy_groups_cache.update(COMMUNICATION_ID, {"default": 1, "001": 1}, 1500000000)
+    mock_async_get_trophy_groups.return_value = {"default": 1, "001": 1}
+
+    await authenticated_plugin.prepare_achievements_context([GAME_ID])
+
+    mock_async_get_earned_trophies.assert_not_called()
+    assert cached is authenticated_plugin._trophies_cache.get(COMMUNICATION_ID, 1600000000)
+
+
+@pytest.mark.asyncio
+async def test_prepare_achievements_context_fetches_all_groups_of_trophy_lists(
+    authenticated_plugin,
+    mocker,
+    mock_async_get_earned_trophies,
+    mock_async_get_trophy_groups
+):
+    _mock_get_game_communication_ids(mocker, {GAME_ID: [COMMUNICATION_ID]})
+    mocker.patch("plugin.PSNClient.get_trophy_title_summaries", new_callable=AsyncMock, return_value={
+        COMMUNICATION_ID: TrophyTitle(1600000000, 30, 3)
+    })
+    # cached before trophies were kept as columns
+    authenticated_plugin._trophies_cache.update(COMMUNICATION_ID, UNLOCKED_ACHIEVEMENTS[:1], 1500000000)
+    authenticated_plugin._trophy_groups_cache.update(COMMUNICATION_ID, {"default": 1}, 1500000000)
+    mock_async_get_earned_trophies.return_value = EarnedTrophies(COMMUNICATION_ID)
+
+    await authenticated_plugin.prepare_achievements_context([GAME_ID])
+
+    mock_async_get_earned_trophies.assert_called_once_with(COMMUNICATION_ID)
+    mock_async_get_trophy_groups.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_prepare_achievements_context_stores_trophy_groups(
+    authenticated_plugin,
+    mocker,
+    mock_async_get_earned_trophies,
+    mock_async_get_trophy_groups
+):
+    _mock_get_game_communication_ids(mocker, {GAME_ID: [COMMUNICATION_ID]})
+    mocker.patch("plugin.PSNClient.get_trophy_title_summaries", new_callable=AsyncMock, return_value={
+        COMMUNICATION_ID: TrophyTitle(1600000000, 30, 3)
+    })
+    mock_async_get_earned_trophies.return_value = EarnedTrophies(
+        COMMUNICATION_ID, [1, 2, 42], ["ach1", "ach2", "ach42"], [1.0, 2.0, 3.0], ["default", "default", "001"]
+    )
+
+    await authenticated_plugin.prepare_achievements_context([GAME_ID])
+
+    mock_async_get_earned_trophies.assert_called_once_with(COMMUNICATION_ID)
+    mock_async_get_trophy_groups.assert_not_called()
+    assert authenticated_plugin._trophy_groups_cache.get(COMMUNICATION_ID, 1600000000) == {"default": 2, "001": 1}
+
+
+def test_earned_trophies_columns():
+    trophies = EarnedTrophies(COMMUNICATION_ID, [1, 2], ["ach1", "ach2"], [1.0, 2.0], ["default", "001"])
+    achievements = [
+        Achievement(achievement_id=COMMUNICATION_ID + "_1", achievement_name="ach1", unlock_time=1.0),
+        Achievement(achievement_id=COMMUNICATION_ID + "_2", achievement_name="ach2", unlock_time=2.0)
+    ]
+
+    assert len(trophies) == 2
+    assert trophies[-1] == achievements[1]
+    assert trophies[1:] == achievements[1:]
+    assert list(trophies) == achievements
+    assert trophies == achievements
+    assert serialization.loads(serialization.dumps(trophies)) == achievements
+    assert EarnedTrophies(COMMUNICATION_ID) == []
+
+
+def test_earned_trophies_merge():
+    cached = EarnedTrophies(COMMUNICATION_ID, [1, 42], ["ach1", "ach42"], [1.0, 2.0], ["default", "001"])
+    fetched = EarnedTrophies(COMMUNICATION_ID, [42, 43], ["ach42", "ach43"], [2.0, 3.0], ["001", "001"])
+
+    merged = cached.merge(fetched)
+
+    assert [1, 42, 43] == [int(trophy.achievement_id.rsplit("_", 1)[1]) for trophy in merged]
+    assert ["default", "001", "001"] == merged.group_ids
+    assert cached is cached.merge(EarnedTrophies(COMMUNICATION_ID))
+    assert fetched == EarnedTrophies(COMMUNICATION_ID).merge(fetched)
@@ -1,16 +1,21 @@
+import asyncio
 import json
 import pytest
+import time
 
 from aioresponses import aioresponses
 from galaxy.api.errors import AuthenticationRequired, InvalidCredentials, UnknownBackendResponse
 from galaxy.api.types import Authentication, NextStep
 from http import HTTPStatus
-from plugin import AUTH_PARAMS
+from http_client import AuthenticatedHttpClient, RetryPolicy
+from plugin import AUTH_PARAMS, OAUTH_TOKEN_URL, OAUTH_STORE_TOKEN_URL, WARM_UP_URLS
 from psn_client import USER_INFO_URL
 from unittest.mock import call
 from tests.async_mock import AsyncMock
 
 OWN_USER_INFO_URL = USER_INFO_URL.format(user_id="me")
+AUTH_HOST = "auth.api.sonyentertainmentnetwork.com"
+TOKEN_URL = "https://" + AUTH_HOST + "/2.0/oauth/authorize?response_type=token"
 
 
 @pytest.fixture
@@ -83,6 +88,26 @@ async def test_stored_credentials(
     http_get.assert_called_once_with(OWN_USER_INFO_URL)
 
 
+@pytest.mark.asyncio
+async def test_connections_warmed_up_during_auth(
+    get_access_token,
+    http_get,
+    psn_plugin,
+    access_token,
+    stored_credentials,
+    user_profile,
+    mocker
+):
+    mocker.patch("plugin.WARM_UP_URLS", WARM_UP_URLS)
+    warm_up = mocker.patch.object(psn_plugin._connection_pool, "warm_up", new_callable=AsyncMock)
+    get_access_token.return_value = access_token
+    http_get.return_value = user_profile
+
+    await psn_plugin.authenticate(stored_credentials)
+    await psn_plugin._warm_up_task
+
+    warm_up.assert_called_once_with(WARM_UP_URLS)
+
 @pytest.mark.asyncio
 async def test_failed_to_get_access_token_with_npsso(
     get_access_token,
@@ -182,3 +207,201 @@ async def test_failed_to_refresh_access_token(
         await authenticated_psn_client.async_get_own_user_info()
 
     get_access_token.assert_called_once_with(npsso)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_access_token(
+    backend_mock,
+    authenticated_psn_client,
+    user_profile,
+    npsso,
+    mocker
+):
+    requests_count = 5
+    for _ in range(requests_count):
+        backend_mock.get(OWN_USER_INFO_URL, status=HTTPStatus.UNAUTHORIZED)
+    for _ in range(requests_count):
+        backend_mock.get(OWN_USER_INFO_URL, status=HTTPStatus.OK, body=json.dumps(user_profile))
+
+    get_access_token = mocker.patch(
+        "http_client.AuthenticatedHttpClient.get_access_token",
+        new_callable=AsyncMock,
+        return_value="new_access_token"
+    )
+
+    await asyncio.gather(*[
+        authenticated_psn_client.async_get_own_user_info() for _ in range(requests_count)
+    ])
+
+    get_access_token.assert_called_once_with(npsso)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_failed_to_refresh_access_token(
+    backend_mock,
+    authenticated_psn_client,
+    npsso,
+    mocker
+):
+    requests_count = 3
+    for _ in range(requests_count):
+        backend_mock.get(OWN_USER_INFO_URL, status=HTTPStatus.UNAUTHORIZED)
+
+    get_access_token = mocker.patch(
+        "http_client.AuthenticatedHttpClient.get_access_token",
+        new_callable=AsyncMock,
+        side_effect=InvalidCredentials
+    )
+
+    results = await asyncio.gather(*[
+        authenticated_psn_client.async_get_own_user_info() for _ in range(requests_count)
+    ], return_exceptions=True)
+
+    assert all(isinstance(result, AuthenticationRequired) for result in results)
+    get_access_token.assert_called_once_with(npsso)
+
+
+def _token_redirect(access_token, expires_in):
+    return {"Location": "https://my.playstation.com/auth/response.html#access_token={}&token_type=bearer&expires_in={}".format(
+        access_token, expires_in
+    )}
+
+
+@pytest.mark.asyncio
+async def test_proactive_access_token_renewal(
+    backend_mock,
+    npsso,
+    mocker
+):
+    mocker.patch("http_client.MIN_TOKEN_RENEWAL_DELAY", 0)
+    backend_mock.get(TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("first", 0))
+    backend_mock.get(TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("second", 3599))
+
+    http_client = AuthenticatedHttpClient(TOKEN_URL, None)
+    await http_client.authenticate(npsso)
+    assert "first" == http_client._access_token
+
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    assert "second" == http_client._access_token
+    assert 1 == http_client.metrics.token_refreshes
+    assert 1 == http_client.metrics.proactive_token_refreshes
+    assert 0 == http_client.metrics.failed_token_refreshes
+    assert http_client._access_token_expires_at > time.time() + 3500
+
+    await http_client.logout()
+
+
+@pytest.mark.asyncio
+async def test_failed_access_token_renewal_is_retried(
+    backend_mock,
+    npsso,
+    mocker
+):
+    mocker.patch("http_client.MIN_TOKEN_RENEWAL_DELAY", 0)
+    mocker.patch("http_client.TOKEN_RENEWAL_RETRY_DELAY", 0)
+    backend_mock.get(TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("first", 0))
+    backend_mock.get(TOKEN_URL, status=HTTPStatus.SERVICE_UNAVAILABLE)
+    backend_mock.get(TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("second", 3599))
+
+    http_client = AuthenticatedHttpClient(
+        TOKEN_URL, None, retry_policies={AUTH_HOST: RetryPolicy(max_attempts=1)}
+    )
+    await http_client.authenticate(npsso)
+    expires_at = http_client._access_token_expires_at
+
+    for _ in range(5):
+        await asyncio.sleep(0)
+        if http_client.metrics.failed_token_refreshes:
+            break
+    # the failed renewal keeps the expiry of the current token
+    assert 1 == http_client.metrics.failed_token_refreshes
+    assert "first" == http_client._access_token
+    assert expires_at == http_client._access_token_expires_at
+
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    assert "second" == http_client._access_token
+    assert 2 == http_client.metrics.proactive_token_refreshes
+    assert http_client._access_token_expires_at > time.time() + 3500
+
+    await http_client.logout()
+
+
+@pytest.fixture()
+def stored_session(account_id, online_id):
+    expires_at = time.time() + 3600
+    return {
+        "user_id": account_id,
+        "user_name": online_id,
+        "access_token": {"access_token": "network_token", "expires_at": expires_at},
+        "store_access_token": {"access_token": "store_token", "expires_at": expires_at}
+    }
+
+
+@pytest.mark.asyncio
+async def test_warm_start_with_stored_session(
+    get_access_token,
+    http_get,
+    psn_plugin,
+    stored_credentials,
+    stored_session,
+    auth_info
+):
+    assert auth_info == await psn_plugin.authenticate({**stored_credentials, "session": stored_session})
+
+    get_access_token.assert_not_called()
+    http_get.assert_not_called()
+    assert "network_token" == psn_plugin._http_client._access_token
+    assert "store_token" == psn_plugin._store_http_client._access_token
+
+
+@pytest.mark.asyncio
+async def test_expired_stored_session(
+    get_access_token,
+    http_get,
+    psn_plugin,
+    access_token,
+    stored_credentials,
+    stored_session,
+    npsso,
+    user_profile,
+    auth_info
+):
+    stored_session["store_access_token"]["expires_at"] = time.time()
+    get_access_token.return_value = access_token
+    http_get.return_value = user_profile
+
+    assert auth_info == await psn_plugin.authenticate({**stored_credentials, "session": stored_session})
+
+    assert 2 == get_access_token.call_count
+    http_get.assert_called_once_with(OWN_USER_INFO_URL)
+
+
+@pytest.mark.asyncio
+async def test_session_stored_with_credentials(
+    backend_mock,
+    http_get,
+    psn_plugin,
+    stored_credentials,
+    account_id,
+    online_id,
+    user_profile,
+    mocker
+):
+    backend_mock.get(OAUTH_TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("network_token", 3599))
+    backend_mock.get(OAUTH_STORE_TOKEN_URL, status=HTTPStatus.FOUND, headers=_token_redirect("store_token", 3599))
+    http_get.return_value = user_profile
+    store_credentials = mocker.patch("plugin.PSNPlugin.store_credentials")
+
+    await psn_plugin.authenticate(stored_credentials)
+
+    credentials = store_credentials.call_args[0][0]
+    session = credentials["session"]
+    assert stored_credentials["npsso"] == credentials["npsso"]
+    assert (account_id, online_id) == (session["user_id"], session["user_name"])
+    assert "network_token" == session["access_token"]["access_token"]
+    assert "store_token" == session["store_access_token"]["access_token"]
+    assert session["store_access_token"]["expires_at"] > time.time() + 3500
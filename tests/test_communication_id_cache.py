@@ -1,34 +1,38 @@
+import asyncio
 import itertools
 import json
+import time
 
 import pytest
 from galaxy.api.jsonrpc import InvalidParams
 
-from plugin import COMMUNICATION_IDS_CACHE_KEY, ENTITLEMENTS_CACHE_KEY, GAME_INFO_CACHE_KEY
-from psn_client import GAME_DETAILS_URL
+from plugin import COMMUNICATION_IDS_CACHE_KEY, ENTITLEMENTS_CACHE_KEY, GAME_INFO_CACHE_KEY, OWNED_GAMES_CACHE_KEY, FULL_GAME_LIST_SYNC_INTERVAL
+from psn_client import GAME_DETAILS_URL, OwnedGame
 from tests.async_mock import AsyncMock
 from tests.test_data import GAMES, TITLE_TO_COMMUNICATION_ID, ENTITLEMENT_TO_GAME_INFO, TITLES, PS3_ENTITLEMENTS, PS3_GAMES, ALL_GAMES, ENTITLEMENTS_CACHE, UNLOCKED_ACHIEVEMENTS, CONTEXT, TROPHIES_CACHE
 
 GAME_ID = GAMES[7].game_id
 ENTITLEMENT_ID = PS3_GAMES[0].game_id
 
+
+def owned_games(titles):
+    return [OwnedGame(title, None) for title in titles]
+
 @pytest.fixture
 def mock_client_get_owned_games(mocker):
-    mocked = mocker.patch(
-        "plugin.PSNClient.async_get_owned_games",
-        new_callable=AsyncMock,
-        return_value=TITLES
-    )
+    async def pages(played_after):
+        yield owned_games(TITLES)
+
+    mocked = mocker.patch("plugin.PSNClient.async_stream_owned_games", side_effect=pages)
     yield mocked
-    mocked.assert_called_once_with()
+    mocked.assert_called_once_with(None)
 
 @pytest.fixture
 def mock_client_get_owned_ps3_entitlements(mocker):
-    mocked = mocker.patch(
-        "plugin.PSNClient.async_get_owned_ps3_entitlements",
-        new_callable=AsyncMock,
-        return_value=PS3_ENTITLEMENTS
-    )
+    async def pages():
+        yield PS3_ENTITLEMENTS
+
+    mocked = mocker.patch("plugin.PSNClient.async_stream_owned_ps3_entitlements", side_effect=pages)
     yield mocked
     mocked.assert_called_once_with()
 
@@ -172,6 +176,185 @@ async def test_cache_miss_on_games_retrieval(
     assert set(info_not_cached) == set([e["id"] for e in mock_info_calls_args])
 
 
+@pytest.mark.asyncio
+async def test_communication_ids_resolved_while_paging(
+    authenticated_plugin,
+    mock_get_game_communication_id_map,
+    mock_client_get_owned_ps3_entitlements,
+    mock_get_game_info,
+    mocker
+):
+    first_page_resolved = asyncio.Event()
+
+    async def pages(played_after):
+        yield owned_games(TITLES[:5])
+        # the next page only arrives once the first one is being resolved
+        await first_page_resolved.wait()
+        yield owned_games(TITLES[5:])
+
+    def comm_id_map(title_ids):
+        first_page_resolved.set()
+        return {title_id: TITLE_TO_COMMUNICATION_ID[title_id] for title_id in title_ids}
+
+    mocker.patch("plugin.PSNClient.async_stream_owned_games", side_effect=pages)
+    mock_get_game_communication_id_map.side_effect = comm_id_map
+    mock_get_game_info.side_effect = game_info_getter
+
+    assert ALL_GAMES == await asyncio.wait_for(authenticated_plugin.get_owned_games(), 1)
+    assert TITLE_TO_COMMUNICATION_ID == authenticated_plugin.persistent_cache[COMMUNICATION_IDS_CACHE_KEY]
+
+
+@pytest.mark.asyncio
+async def test_communication_ids_pushed_once_per_game_list(
+    authenticated_plugin,
+    mock_get_game_communication_id_map,
+    mocker
+):
+    async def pages(played_after):
+        for page_start in range(0, len(TITLES), 3):
+            yield owned_games(TITLES[page_start:page_start + 3])
+
+    mocker.patch("plugin.PSNClient.async_stream_owned_games", side_effect=pages)
+    mock_get_game_communication_id_map.side_effect = \
+        lambda title_ids: {title_id: TITLE_TO_COMMUNICATION_ID[title_id] for title_id in title_ids}
+    push_cache = mocker.patch.object(authenticated_plugin, "push_cache")
+
+    await authenticated_plugin._filter_owned_games()
+
+    assert 1 < mock_get_game_communication_id_map.call_count
+    push_cache.assert_called_once_with()
+    assert TITLE_TO_COMMUNICATION_ID == authenticated_plugin.persistent_cache[COMMUNICATION_IDS_CACHE_KEY]
+
+
+@pytest.mark.asyncio
+async def test_ps3_game_info_resolved_while_paging(
+    authenticated_plugin,
+    mock_client_get_owned_games,
+    mock_get_game_communication_id_map,
+    mocker
+):
+    first_page_resolved = asyncio.Event()
+    running = 0
+    max_running = 0
+
+    async def pages():
+        yield PS3_ENTITLEMENTS[:2]
+        await first_page_resolved.wait()
+        yield PS3_ENTITLEMENTS[2:]
+
+    async def get_game_info(entitlement):
+        nonlocal running, max_running
+        first_page_resolved.set()
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return ENTITLEMENT_TO_GAME_INFO[entitlement["id"]]
+
+    mocker.patch("plugin.PSNClient.async_stream_owned_ps3_entitlements", side_effect=pages)
+    mock_get_game_communication_id_map.side_effect = comm_id_getter()
+    mocker.patch("plugin.PSNClient.async_get_game_info", side_effect=get_game_info)
+    authenticated_plugin._game_info_lookups = asyncio.Semaphore(2)
+
+    assert ALL_GAMES == await asyncio.wait_for(authenticated_plugin.get_owned_games(), 1)
+    assert ENTITLEMENT_TO_GAME_INFO == authenticated_plugin.persistent_cache[GAME_INFO_CACHE_KEY]
+    assert 2 == max_running
+
+
+@pytest.mark.asyncio
+async def test_ps3_game_info_pushed_once_per_entitlement_list(authenticated_plugin, mock_get_game_info, mocker):
+    async def pages():
+        for entitlement in PS3_ENTITLEMENTS:
+            yield [entitlement]
+
+    mocker.patch("plugin.PSNClient.async_stream_owned_ps3_entitlements", side_effect=pages)
+    mock_get_game_info.side_effect = game_info_getter
+    push_cache = mocker.patch.object(authenticated_plugin, "push_cache")
+
+    await authenticated_plugin._map_owned_ps3_games()
+
+    assert len(PS3_ENTITLEMENTS) == mock_get_game_info.call_count
+    push_cache.assert_called_once_with()
+    assert ENTITLEMENT_TO_GAME_INFO == authenticated_plugin.persistent_cache[GAME_INFO_CACHE_KEY]
+
+
+@pytest.mark.asyncio
+async def test_delta_games_sync_merges_snapshot(
+    authenticated_plugin,
+    mock_get_game_communication_id_map,
+    mock_client_get_owned_ps3_entitlements,
+    mock_get_game_info,
+    mock_persistent_cache,
+    mocker
+):
+    now = time.time()
+    played = OwnedGame(TITLES[3], now - 10)
+
+    async def pages(played_after):
+        yield [played]
+
+    stream = mocker.patch("plugin.PSNClient.async_stream_owned_games", side_effect=pages)
+    mock_persistent_cache.return_value = {
+        COMMUNICATION_IDS_CACHE_KEY: TITLE_TO_COMMUNICATION_ID.copy(),
+        GAME_INFO_CACHE_KEY: ENTITLEMENT_TO_GAME_INFO.copy(),
+        OWNED_GAMES_CACHE_KEY: {
+            "played_after": now - 100,
+            "full_sync_time": now - 1000,
+            "games": [[title.game_id, title.game_title] for title in TITLES]
+        }
+    }
+
+    games = await authenticated_plugin.get_owned_games()
+
+    stream.assert_called_once_with(now - 100)
+    assert [GAMES[3]] + GAMES[:3] + GAMES[4:] + PS3_GAMES == games
+    assert not mock_get_game_communication_id_map.called
+    snapshot = authenticated_plugin.persistent_cache[OWNED_GAMES_CACHE_KEY]
+    assert now - 10 == snapshot["played_after"]
+    assert now - 1000 == snapshot["full_sync_time"]
+
+
+@pytest.mark.asyncio
+async def test_full_games_sync_when_due(
+    authenticated_plugin,
+    mock_client_get_owned_games,
+    mock_get_game_communication_id_map,
+    mock_client_get_owned_ps3_entitlements,
+    mock_get_game_info,
+    mock_persistent_cache
+):
+    mock_persistent_cache.return_value = {
+        COMMUNICATION_IDS_CACHE_KEY: TITLE_TO_COMMUNICATION_ID.copy(),
+        GAME_INFO_CACHE_KEY: ENTITLEMENT_TO_GAME_INFO.copy(),
+        OWNED_GAMES_CACHE_KEY: {
+            "played_after": time.time() - 100,
+            "full_sync_time": time.time() - FULL_GAME_LIST_SYNC_INTERVAL,
+            "games": [["REMOVED_00", "Removed"]]
+        }
+    }
+
+    assert ALL_GAMES == await authenticated_plugin.get_owned_games()
+    snapshot = authenticated_plugin.persistent_cache[OWNED_GAMES_CACHE_KEY]
+    assert [[title.game_id, title.game_title] for title in TITLES] == snapshot["games"]
+
+
+@pytest.mark.asyncio
+async def test_ps3_games_deferred_while_store_unavailable(
+    authenticated_plugin,
+    mock_client_get_owned_games,
+    mock_get_game_communication_id_map,
+    mock_client_get_owned_ps3_entitlements,
+    mock_get_game_info,
+    mocker
+):
+    mocker.patch("plugin.PSNClient.is_store_available", new_callable=mocker.PropertyMock, return_value=False)
+    mock_get_game_communication_id_map.side_effect = comm_id_getter()
+
+    assert GAMES == await authenticated_plugin.get_owned_games()
+    assert {} == authenticated_plugin.persistent_cache.get(GAME_INFO_CACHE_KEY, {})
+    assert not mock_get_game_info.called
+
+
 @pytest.mark.asyncio
 async def test_cache_miss_on_dlc_achievements_retrieval(
     authenticated_plugin,
@@ -329,4 +512,4 @@ async def test_get_game_communication_id(
 ):
     http_get.return_value = backend_response
     assert mapping == await authenticated_psn_client.async_get_game_communication_id_map(mapping.keys())
-    http_get.assert_called_once_with(GAME_DETAILS_URL.format(game_id_list=",".join(mapping.keys())))
+    http_get.assert_called_once_with(GAME_DETAILS_URL.format(game_id_list=",".join(mapping.keys())), coalesce=True)
@@ -21,7 +21,7 @@ async def test_empty_response(
     http_get.return_value = {}
 
     assert [] == await authenticated_plugin.get_friends()
-    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL)
+    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL, revalidate=True)
 
 
 @pytest.mark.asyncio
@@ -46,7 +46,7 @@ async def test_bad_format(
     with pytest.raises(UnknownBackendResponse):
         await authenticated_plugin.get_friends()
 
-    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL)
+    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL, revalidate=True)
 
 
 @pytest.mark.asyncio
@@ -63,4 +63,4 @@ async def test_get_friends(
 ):
     http_get.return_value = backend_response
     assert friend_list == await authenticated_plugin.get_friends()
-    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL)
+    http_get.assert_called_once_with(GET_ALL_FRIENDS_URL, revalidate=True)
@@ -0,0 +1,501 @@
+import asyncio
+import json
+import pytest
+
+from aiohttp import web
+from aioresponses import aioresponses
+from circuit_breaker import CircuitBreaker, CircuitBreakers, CircuitState
+from connection_pool import ConnectionPool
+from galaxy.api.errors import BackendError, BackendNotAvailable, TooManyRequests
+from hedging import HedgeBudget, Hedger
+from http import HTTPStatus
+from http_client import AuthenticatedHttpClient, RetryPolicy, paginate_url, retry_budget
+from psn_client import EARNED_TROPHIES_PAGE, ENDPOINT_TEMPLATES, FRIENDS_URL, FRIENDS_WITH_PRESENCE_URL, TROPHY_TITLES_URL
+from request_stats import RequestStats
+from tests.async_mock import AsyncMock
+from throttling import ConcurrencyLimiter, RateLimit, RateLimiter, TokenBucket
+
+TROPHY_HOST = "pl-tpy.np.community.playstation.net"
+TROPHY_URL = "https://" + TROPHY_HOST + "/trophy/v1/trophyTitles"
+
+
+@pytest.fixture
+def backend_mock():
+    with aioresponses() as response:
+        yield response
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_per_host():
+    limiter = ConcurrencyLimiter({TROPHY_HOST: 2})
+    running = 0
+    max_running = 0
+
+    async def task():
+        nonlocal running, max_running
+        async with limiter.acquire(TROPHY_URL):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0)
+            running -= 1
+
+    await asyncio.gather(*[task() for _ in range(6)])
+
+    assert 2 == max_running
+    stats = limiter.stats[TROPHY_HOST]
+    assert 6 == stats.acquired
+    assert 4 == stats.waited
+    assert 4 == stats.max_queued
+    assert 0 == stats.queued
+    assert 0 == stats.in_flight
+
+
+@pytest.mark.asyncio
+async def test_hosts_are_limited_independently():
+    limiter = ConcurrencyLimiter({TROPHY_HOST: 1}, default_limit=1)
+
+    async def acquire_store():
+        async with limiter.acquire("https://store.playstation.com/"):
+            pass
+
+    async with limiter.acquire(TROPHY_URL):
+        await asyncio.wait_for(acquire_store(), 1)
+
+    assert {TROPHY_HOST, "store.playstation.com"} == set(limiter.stats)
+
+
+@pytest.mark.asyncio
+async def test_request_goes_through_limiter(
+    backend_mock,
+    authenticated_psn_client
+):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"trophyTitles": []}))
+
+    http_client = authenticated_psn_client._http_client
+    assert {"trophyTitles": []} == await http_client.get(TROPHY_URL)
+
+    stats = http_client.concurrency_stats[TROPHY_HOST]
+    assert 1 == stats.acquired
+    assert 0 == stats.in_flight
+
+
+@pytest.fixture
+def sleep(mocker):
+    return mocker.patch("http_client.asyncio.sleep", new_callable=AsyncMock)
+
+
+@pytest.fixture
+async def http_client():
+    client = AuthenticatedHttpClient("", None, retry_policies={TROPHY_HOST: RetryPolicy(max_attempts=3, jitter=0)})
+    client._access_token = "access_token"
+    yield client
+    await client.logout()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_backend_error(backend_mock, http_client, sleep):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.SERVICE_UNAVAILABLE)
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.BAD_GATEWAY)
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"trophyTitles": []}))
+
+    assert {"trophyTitles": []} == await http_client.get(TROPHY_URL)
+
+    assert [0.5, 1.0] == [args[0] for args, _ in sleep.call_args_list]
+    assert 2 == http_client.metrics.retries
+
+
+@pytest.mark.asyncio
+async def test_retry_gives_up_after_max_attempts(backend_mock, http_client, sleep):
+    for _ in range(3):
+        backend_mock.get(TROPHY_URL, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    with pytest.raises(BackendError):
+        await http_client.get(TROPHY_URL)
+
+    assert 2 == sleep.call_count
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE])
+async def test_retry_honours_retry_after(backend_mock, http_client, sleep, status):
+    backend_mock.get(TROPHY_URL, status=status, headers={"Retry-After": "7"})
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({}))
+
+    assert {} == await http_client.get(TROPHY_URL)
+
+    sleep.assert_called_once_with(7.0)
+
+
+@pytest.mark.asyncio
+async def test_retry_after_too_long(backend_mock, http_client, sleep):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.TOO_MANY_REQUESTS, headers={"Retry-After": "3600"})
+
+    with pytest.raises(TooManyRequests):
+        await http_client.get(TROPHY_URL)
+
+    sleep.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_no_retry_for_post(backend_mock, http_client, sleep):
+    backend_mock.post(TROPHY_URL, status=HTTPStatus.SERVICE_UNAVAILABLE)
+
+    with pytest.raises(BackendNotAvailable):
+        await http_client.post(TROPHY_URL)
+
+    sleep.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_is_shared_by_operation(backend_mock, http_client, sleep):
+    for _ in range(2):
+        backend_mock.get(TROPHY_URL, status=HTTPStatus.SERVICE_UNAVAILABLE)
+
+    with retry_budget(max_retries=1):
+        results = await asyncio.gather(
+            http_client.get(TROPHY_URL),
+            http_client.get(TROPHY_URL),
+            return_exceptions=True
+        )
+
+    assert 1 == sleep.call_count
+    assert any(isinstance(result, BackendNotAvailable) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_when_empty(sleep):
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    for _ in range(2):
+        await bucket.acquire()
+    sleep.assert_not_called()
+
+    await bucket.acquire()
+    sleep.assert_called_once()
+    assert 0.5 == pytest.approx(sleep.call_args[0][0], abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_families(sleep):
+    limiter = RateLimiter({"trophy": RateLimit(rate=1, capacity=5), "profile": RateLimit(rate=1, capacity=5)})
+
+    await limiter.acquire(TROPHY_URL)
+    await limiter.acquire("https://us-prof.np.community.playstation.net/userProfile/v1/users/me/friends")
+    await limiter.acquire("https://pl-prof.np.community.playstation.net/userProfile/v1/users/me/profile2")
+    await limiter.acquire("https://gamelist.api.playstation.com/v1/users/me/titles")
+
+    levels = limiter.levels
+    assert 4 == pytest.approx(levels["trophy"], abs=0.01)
+    assert 3 == pytest.approx(levels["profile"], abs=0.01)
+    sleep.assert_not_called()
+
+
+@pytest.fixture
+async def local_server():
+    async def handler(request):
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield "http://127.0.0.1:{}/".format(runner.addresses[0][1])
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_shared_by_sessions(local_server):
+    pool = ConnectionPool()
+    sessions = [pool.create_session(), pool.create_session()]
+
+    for session in sessions + sessions:
+        async with session.get(local_server) as response:
+            await response.read()
+
+    for session in sessions:
+        await session.close()
+    assert 1 == pool.stats.opened
+    assert 3 == pool.stats.reused
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_warm_up(local_server):
+    pool = ConnectionPool()
+    unreachable = "http://127.0.0.1:1/"
+    await pool.warm_up([local_server + "some/path?x=1", local_server, unreachable])
+    assert 1 == pool.stats.opened
+
+    session = pool.create_session()
+    async with session.get(local_server) as response:
+        await response.read()
+    await session.close()
+    assert 1 == pool.stats.opened
+    assert 1 == pool.stats.reused
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_gets_are_coalesced(backend_mock, http_client):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"trophyTitles": []}))
+
+    results = await asyncio.gather(*[http_client.get(TROPHY_URL, coalesce=True) for _ in range(3)])
+
+    assert [{"trophyTitles": []}] * 3 == results
+    assert results[0] is results[1] is results[2]
+    assert 2 == http_client.metrics.coalesced_requests
+    assert {} == http_client._in_flight_gets
+
+
+@pytest.mark.asyncio
+async def test_sequential_gets_are_not_coalesced(backend_mock, http_client):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"page": 1}))
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"page": 2}))
+
+    assert {"page": 1} == await http_client.get(TROPHY_URL, coalesce=True)
+    assert {"page": 2} == await http_client.get(TROPHY_URL, coalesce=True)
+    assert 0 == http_client.metrics.coalesced_requests
+
+
+@pytest.mark.asyncio
+async def test_gets_are_not_coalesced_by_default(backend_mock, http_client):
+    for page in range(3):
+        backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"page": page}))
+
+    results = await asyncio.gather(*[http_client.get(TROPHY_URL) for _ in range(3)])
+
+    assert [{"page": 0}, {"page": 1}, {"page": 2}] == sorted(results, key=lambda result: result["page"])
+    assert 0 == http_client.metrics.coalesced_requests
+
+
+@pytest.mark.asyncio
+async def test_revalidation_cache_serves_not_modified(backend_mock, http_client):
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"trophyTitles": []}), headers={"ETag": "v1"})
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.NOT_MODIFIED)
+
+    first = await http_client.get(TROPHY_URL, revalidate=True)
+    second = await http_client.get(TROPHY_URL, revalidate=True)
+
+    assert {"trophyTitles": []} == first
+    assert first is second
+    assert 1 == http_client.metrics.revalidated_responses
+    conditional_request = list(backend_mock.requests.values())[0][1]
+    assert "v1" == conditional_request.kwargs["headers"]["If-None-Match"]
+
+
+@pytest.mark.asyncio
+async def test_revalidation_cache_updated_on_change(backend_mock, http_client):
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"v": 1}), headers={"Last-Modified": last_modified})
+    backend_mock.get(TROPHY_URL, status=HTTPStatus.OK, body=json.dumps({"v": 2}), headers={"ETag": "v2"})
+
+    assert {"v": 1} == await http_client.get(TROPHY_URL, revalidate=True)
+    assert {"v": 2} == await http_client.get(TROPHY_URL, revalidate=True)
+
+    conditional_request = list(backend_mock.requests.values())[0][1]
+    assert last_modified == conditional_request.kwargs["headers"]["If-Modified-Since"]
+    assert "v2" == http_client._revalidation_cache.get(TROPHY_URL).etag
+    assert 0 == http_client.metrics.revalidated_responses
+
+
+def test_circuit_breaker_opens_and_probes(mocker):
+    now = mocker.patch("circuit_breaker.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert CircuitState.Closed == breaker.state
+    breaker.record_failure()
+    assert CircuitState.Open == breaker.state
+    assert not breaker.allow_request()
+
+    now.return_value = 130.0
+    assert CircuitState.HalfOpen == breaker.state
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert CircuitState.Closed == breaker.state
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_reopens_on_failed_probe(mocker):
+    now = mocker.patch("circuit_breaker.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    now.return_value = 130.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert CircuitState.Open == breaker.state
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast(backend_mock, sleep):
+    client = AuthenticatedHttpClient(
+        "", None,
+        circuit_breakers=CircuitBreakers(failure_threshold=2),
+        retry_policies={TROPHY_HOST: RetryPolicy(max_attempts=3, jitter=0)}
+    )
+    client._access_token = "access_token"
+    for _ in range(2):
+        backend_mock.get(TROPHY_URL, status=HTTPStatus.SERVICE_UNAVAILABLE)
+
+    with pytest.raises(BackendNotAvailable):
+        await client.get(TROPHY_URL)
+    assert CircuitState.Open == client.circuit_state(TROPHY_URL)
+
+    with pytest.raises(BackendNotAvailable):
+        await client.get(TROPHY_URL)
+    assert 2 == len(list(backend_mock.requests.values())[0])
+    assert CircuitState.Closed == client.circuit_state("https://store.playstation.com/")
+    await client.logout()
+
+
+def test_hedge_delay_follows_latency_percentile():
+    hedger = Hedger(percentile=0.9, min_samples=10)
+    for latency in range(1, 10):
+        hedger.record_latency(TROPHY_URL, latency / 10)
+    assert hedger.delay(TROPHY_URL) is None
+
+    hedger.record_latency(TROPHY_URL, 1.0)
+    assert 1.0 == hedger.delay(TROPHY_URL)
+    assert hedger.delay("https://store.playstation.com/") is None
+
+
+def test_hedge_budget():
+    budget = HedgeBudget(ratio=0.5, burst=1)
+    assert budget.spend()
+    assert not budget.spend()
+    budget.earn()
+    assert not budget.spend()
+    budget.earn()
+    assert budget.spend()
+
+
+@pytest.fixture
+async def slow_first_server():
+    calls = 0
+    released = asyncio.Event()
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        call = calls
+        if call == 1:
+            await released.wait()
+        return web.json_response({"call": call})
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield "http://127.0.0.1:{}/".format(runner.addresses[0][1])
+    released.set()
+    # let the abandoned handler finish before the server goes away
+    await asyncio.sleep(0.01)
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_first_answer_wins(slow_first_server):
+    hedger = Hedger(min_samples=1)
+    hedger.record_latency(slow_first_server, 0.05)
+    client = AuthenticatedHttpClient("", None, hedger=hedger)
+    client._access_token = "access_token"
+
+    assert {"call": 2} == await asyncio.wait_for(client.get(slow_first_server, hedge=True), 2)
+
+    assert 1 == client.metrics.hedged_requests
+    assert 1 == client.metrics.hedge_wins
+    await client.logout()
+
+
+@pytest.mark.asyncio
+async def test_hedge_delay_starts_when_request_is_sent(slow_first_server):
+    hedger = Hedger(min_samples=1)
+    hedger.record_latency(slow_first_server, 0.05)
+    limiter = ConcurrencyLimiter(default_limit=2)
+    client = AuthenticatedHttpClient("", None, hedger=hedger, concurrency_limiter=limiter)
+    client._access_token = "access_token"
+
+    async with limiter.acquire(slow_first_server), limiter.acquire(slow_first_server):
+        request = asyncio.ensure_future(client.get(slow_first_server, hedge=True))
+        await asyncio.sleep(0.2)
+        # still waiting for a slot, neither sent nor hedged
+        assert 0 == client.metrics.hedged_requests
+
+    assert {"call": 2} == await asyncio.wait_for(request, 2)
+    assert 1 == client.metrics.hedged_requests
+    await client.logout()
+
+
+@pytest.mark.asyncio
+async def test_limiters_report_availability():
+    rate_limiter = RateLimiter({"trophy": RateLimit(rate=0.001, capacity=1)})
+    assert rate_limiter.available(TROPHY_URL)
+    await rate_limiter.acquire(TROPHY_URL)
+    assert not rate_limiter.available(TROPHY_URL)
+    assert rate_limiter.available("https://store.playstation.com/")
+
+    concurrency_limiter = ConcurrencyLimiter({TROPHY_HOST: 1})
+    async with concurrency_limiter.acquire(TROPHY_URL):
+        assert not concurrency_limiter.available(TROPHY_URL)
+    assert concurrency_limiter.available(TROPHY_URL)
+
+
+def test_request_stats_keyed_by_template():
+    stats = RequestStats(ENDPOINT_TEMPLATES)
+
+    assert EARNED_TROPHIES_PAGE == stats.endpoint(
+        EARNED_TROPHIES_PAGE.format(communication_id="NPWR01234_00", trophy_group_id="all")
+    )
+    assert TROPHY_TITLES_URL == stats.endpoint(paginate_url(TROPHY_TITLES_URL, 100, 200))
+    assert FRIENDS_URL == stats.endpoint(paginate_url(FRIENDS_URL.format(user_id="me", avatar_size_list="l"), 100))
+    assert FRIENDS_WITH_PRESENCE_URL == stats.endpoint(FRIENDS_WITH_PRESENCE_URL.format(user_id="me"))
+    assert TROPHY_HOST == stats.endpoint("https://" + TROPHY_HOST + "/trophy/v2/unknown")
+
+
+@pytest.mark.asyncio
+async def test_request_stats_recorded(backend_mock, sleep):
+    client = AuthenticatedHttpClient(
+        "", None,
+        request_stats=RequestStats([TROPHY_TITLES_URL]),
+        retry_policies={TROPHY_HOST: RetryPolicy(max_attempts=3, jitter=0)}
+    )
+    client._access_token = "access_token"
+    url = paginate_url(TROPHY_TITLES_URL, 100)
+    body = json.dumps({"trophyTitles": []})
+    backend_mock.get(url, status=HTTPStatus.SERVICE_UNAVAILABLE)
+    backend_mock.get(url, status=HTTPStatus.OK, body=body)
+
+    await client.get(url)
+
+    stats = client.request_stats[TROPHY_TITLES_URL]
+    assert 2 == stats.requests
+    assert 1 == stats.retries
+    assert {"503": 1, "200": 1} == stats.statuses
+    assert 2 == sum(stats.latency_histogram)
+    assert len(body) == stats.response_bytes
+    assert 1 == sum(stats.size_histogram)
+    await client.logout()
+
+
+@pytest.mark.asyncio
+async def test_request_stats_dumped(psn_plugin, tmp_path, mocker):
+    path = tmp_path / "http_stats.json"
+    psn_plugin._http_stats_file = str(path)
+
+    psn_plugin.tick()
+    assert not path.exists()
+
+    mocker.patch("plugin.time.monotonic", return_value=psn_plugin._next_http_stats_dump)
+    psn_plugin.tick()
+    assert {} == json.loads(path.read_text())["endpoints"]
+
+    path.unlink()
+    psn_plugin.shutdown()
+    assert path.exists()
@@ -1,7 +1,7 @@
 import pytest
 from galaxy.api.errors import AuthenticationRequired, UnknownBackendResponse
 from http_client import paginate_url, paginate_store_url
-from psn_client import DEFAULT_LIMIT, MAX_ENTITLEMENTS_PER_REQUEST, GAME_LIST_URL, INTERNAL_ENTITLEMENTS_URL
+from psn_client import DEFAULT_LIMIT, MAX_ENTITLEMENTS_PER_REQUEST, GAME_LIST_URL, INTERNAL_ENTITLEMENTS_URL, parse_last_played
 from tests.async_mock import AsyncMock
 from tests.test_data import COMMUNICATION_ID, GAME_INFO
 from tests.test_data import GAMES, PS3_GAMES, BACKEND_GAME_TITLES_WITHOUT_DLC, BACKEND_ENTITLEMENTS_WITHOUT_DLC
@@ -43,12 +43,19 @@ async def test_get_owned_games(
 
     assert (games + ps3_games) == await authenticated_plugin.get_owned_games()
     http_get.assert_any_call(
-        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT))
+        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT), revalidate=True)
     http_get.assert_any_call(paginate_store_url(INTERNAL_ENTITLEMENTS_URL.format(user_id="me"), MAX_ENTITLEMENTS_PER_REQUEST))
     assert 2 == http_get.call_count
-    get_game_communication_id.assert_called_once_with([game.game_id for game in games])
-    args = get_ps3_game_info.call_args
-    assert [game.game_id for game in ps3_games] == [e["id"] for e in args[0][0]]
+    if games:
+        get_game_communication_id.assert_called_once_with([game.game_id for game in games], push_cache=False)
+    else:
+        # nothing to resolve without titles
+        get_game_communication_id.assert_not_called()
+    if ps3_games:
+        args = get_ps3_game_info.call_args
+        assert [game.game_id for game in ps3_games] == [e["id"] for e in args[0][0]]
+    else:
+        get_ps3_game_info.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_entitlement_paging(
@@ -90,6 +97,81 @@ async def test_bad_format(
         await authenticated_plugin.get_owned_games()
 
     http_get.assert_any_call(
-        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT))
+        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT), revalidate=True)
     http_get.assert_any_call(paginate_store_url(INTERNAL_ENTITLEMENTS_URL.format(user_id="me"), MAX_ENTITLEMENTS_PER_REQUEST))
     assert 2 == http_get.call_count
+
+
+def _played_titles(titles, last_played_dates):
+    return [{**title, "lastPlayedDate": date} for title, date in zip(titles, last_played_dates)]
+
+
+@pytest.mark.asyncio
+async def test_owned_games_played_since(
+    http_get,
+    authenticated_psn_client
+):
+    titles = BACKEND_GAME_TITLES_WITHOUT_DLC["titles"]
+    first_page = {
+        "totalResults": 2 * DEFAULT_LIMIT,
+        "titles": _played_titles(titles[:3], ["2019-07-04T15:46:16.610Z", "2019-07-02T10:00:00Z", "2019-06-01T00:00:00Z"])
+    }
+    http_get.side_effect = [first_page]
+
+    played_after = parse_last_played("2019-07-01T00:00:00Z")
+    pages = [page async for page in authenticated_psn_client.async_stream_owned_games(played_after)]
+
+    assert [[owned_game.game for owned_game in pages[0]]] == [GAMES[:2]]
+    assert parse_last_played("2019-07-04T15:46:16.610Z") == pages[0][0].last_played
+    http_get.assert_called_once_with(
+        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT), revalidate=True)
+
+
+@pytest.mark.asyncio
+async def test_owned_games_played_since_spanning_pages(
+    http_get,
+    authenticated_psn_client
+):
+    titles = BACKEND_GAME_TITLES_WITHOUT_DLC["titles"]
+    first_page = {
+        "totalResults": 2 * DEFAULT_LIMIT + 50,
+        "titles": _played_titles(titles[:2], ["2019-07-04T15:46:16.610Z", "2019-07-03T10:00:00Z"])
+    }
+    second_page = {
+        "totalResults": 2 * DEFAULT_LIMIT + 50,
+        "titles": _played_titles(titles[2:4], ["2019-07-02T10:00:00Z", "2019-06-01T00:00:00Z"])
+    }
+    http_get.side_effect = [first_page, second_page]
+
+    played_after = parse_last_played("2019-07-01T00:00:00Z")
+    pages = [page async for page in authenticated_psn_client.async_stream_owned_games(played_after)]
+
+    assert [GAMES[:2], GAMES[2:3]] == [[owned_game.game for owned_game in page] for page in pages]
+    # the third page is not needed
+    assert 2 == http_get.call_count
+    http_get.assert_called_with(
+        paginate_url(GAME_LIST_URL.format(user_id="me"), DEFAULT_LIMIT, DEFAULT_LIMIT), revalidate=True)
+
+
+@pytest.mark.asyncio
+async def test_owned_games_played_since_keeps_never_played(
+    http_get,
+    authenticated_psn_client
+):
+    titles = BACKEND_GAME_TITLES_WITHOUT_DLC["titles"]
+    # never played titles sorted first
+    first_page = {
+        "totalResults": 2 * DEFAULT_LIMIT,
+        "titles": _played_titles(titles[:2], [None, None])
+    }
+    second_page = {
+        "totalResults": 2 * DEFAULT_LIMIT,
+        "titles": _played_titles(titles[2:4], ["2019-07-02T10:00:00Z", "2019-06-01T00:00:00Z"])
+    }
+    http_get.side_effect = [first_page, second_page]
+
+    played_after = parse_last_played("2019-07-01T00:00:00Z")
+    pages = [page async for page in authenticated_psn_client.async_stream_owned_games(played_after)]
+
+    assert [GAMES[:2], GAMES[2:3]] == [[owned_game.game for owned_game in page] for page in pages]
+    assert [None, None] == [owned_game.last_played for owned_game in pages[0]]
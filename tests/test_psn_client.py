@@ -1,6 +1,10 @@
+import asyncio
 import math
 import pytest
 from galaxy.api.errors import TooManyRequests, UnknownBackendResponse
+from psn_client import (
+    NUMPY_TIMESTAMPS_MIN_BATCH, _numpy_timestamps, _strptime_timestamp, parse_timestamp, parse_timestamps
+)
 from tests.async_mock import AsyncMock
 from tests.test_data import BACKEND_GAME_INFO_DIRECT, BACKEND_GAME_INFO_DIRECT_2, BACKEND_SEARCH_RESULTS, BACKEND_DLC_SEARCH_RESULTS, PS3_ENTITLEMENTS
 
@@ -164,6 +168,62 @@ async def test_pagination(
     assert math.ceil(len(TROPHIES) / limit) == http_get.call_count
 
 
+@pytest.mark.asyncio
+async def test_streaming_pagination(
+    http_get,
+    authenticated_psn_client
+):
+    limit = 13
+    http_get.side_effect = create_backend_response_generator(limit)()
+
+    pages = []
+    async for records in authenticated_psn_client.stream_paginated_data(
+        parser, TROPHIES_PAGE, "totalResults", limit, lookahead=2
+    ):
+        # the page being consumed and at most two more were requested
+        assert len(pages) + 3 >= http_get.call_count
+        pages.append(records)
+
+    assert math.ceil(len(TROPHIES) / limit) == len(pages)
+    assert_all_games_fetched([record for records in pages for record in records])
+
+
+@pytest.mark.asyncio
+async def test_streaming_pagination_without_lookahead(
+    http_get,
+    authenticated_psn_client
+):
+    limit = 13
+    http_get.side_effect = create_backend_response_generator(limit)()
+
+    pages = []
+    async for records in authenticated_psn_client.stream_paginated_data(
+        parser, TROPHIES_PAGE, "totalResults", limit, lookahead=0
+    ):
+        # nothing is requested ahead of the page being consumed
+        assert len(pages) + 1 == http_get.call_count
+        pages.append(records)
+
+    assert math.ceil(len(TROPHIES) / limit) == len(pages)
+    assert_all_games_fetched([record for records in pages for record in records])
+
+
+@pytest.mark.asyncio
+async def test_streaming_pagination_stopped_early(
+    http_get,
+    authenticated_psn_client
+):
+    http_get.side_effect = create_backend_response_generator(13)()
+
+    stream = authenticated_psn_client.stream_paginated_data(parser, TROPHIES_PAGE, "totalResults", 13, lookahead=2)
+    async for _ in stream:
+        # let the requests ahead start
+        await asyncio.sleep(0)
+        break
+    await stream.aclose()
+
+    assert 3 == http_get.call_count
+
 @pytest.mark.asyncio
 async def test_single_fetch(
     http_get,
@@ -275,3 +335,58 @@ async def test_dlc_name_match_reuslts(
 
     game_info = await authenticated_psn_client.async_get_game_info(PS3_ENTITLEMENTS[7])
     assert game_info == {}
+
+
+@pytest.mark.parametrize("earned_date", [
+    "1970-01-01T00:00:00Z",
+    "1987-02-07T10:14:42Z",
+    "2018-06-08T13:22:23Z",
+    "2020-02-29T23:59:59Z",
+    "0001-01-01T00:00:00Z",
+    "9999-12-31T23:59:59Z",
+    "2018-6-8T1:2:3Z"
+])
+def test_parse_timestamp(earned_date):
+    assert _strptime_timestamp(earned_date) == parse_timestamp(earned_date)
+    assert parse_timestamps([earned_date, earned_date]) == [parse_timestamp(earned_date)] * 2
+
+
+@pytest.mark.parametrize("earned_date", [
+    "2019-02-29T00:00:00Z",
+    "2018-13-08T13:22:23Z",
+    "2018-06-08T24:22:23Z",
+    "2018-06-08T13:22:60Z",
+    "2018-06-08 13:22:23Z",
+    "2018-06-08T13:22:23.000Z",
+    "0000-01-01T00:00:00Z",
+    "",
+    None
+])
+def test_parse_timestamp_bad_format(earned_date):
+    with pytest.raises((ValueError, TypeError)):
+        parse_timestamp(earned_date)
+
+
+def test_parse_timestamps_numpy():
+    pytest.importorskip("numpy")
+    earned_dates = [
+        "1970-01-01T00:00:00Z", "2020-02-29T23:59:59Z", "0001-01-01T00:00:00Z", "9999-12-31T23:59:59Z"
+    ] * (NUMPY_TIMESTAMPS_MIN_BATCH // 4)
+
+    assert _numpy_timestamps(earned_dates) == [_strptime_timestamp(earned_date) for earned_date in earned_dates]
+    assert parse_timestamps(earned_dates) == [_strptime_timestamp(earned_date) for earned_date in earned_dates]
+
+
+@pytest.mark.parametrize("earned_date", [
+    "2019-02-29T00:00:00Z",
+    "2018-13-08T13:22:23Z",
+    "2018-06-08T13:22:60Z",
+    "2018-06-08 13:22:23Z",
+    "2018-6-8T1:2:3Z",
+    "0000-01-01T00:00:00Z"
+])
+def test_parse_timestamps_numpy_off_layout(earned_date):
+    pytest.importorskip("numpy")
+    earned_dates = ["2018-06-08T13:22:23Z"] * NUMPY_TIMESTAMPS_MIN_BATCH + [earned_date]
+
+    assert _numpy_timestamps(earned_dates) is None
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import serialization
+
+
+@pytest.fixture(params=["json", "orjson", "ujson"])
+def json_decoder(request):
+    previous = serialization.json_decoder_name
+    try:
+        serialization.use_json_decoder(request.param)
+    except ImportError:
+        pytest.skip("{} not installed".format(request.param))
+    yield request.param
+    serialization.use_json_decoder(previous)
+
+
+@pytest.mark.parametrize("data", [
+    '{"entitlements": [{"id": "EP0001", "active_flag": true}], "total_results": 1}',
+    '{"name": "Pok\\u00e9mon", "rate": 1.5, "missing": null}',
+    '[NaN, 123456789012345678901234567890]'
+])
+def test_json_decoders_agree_with_stdlib(json_decoder, data):
+    assert json.dumps(json.loads(data)) == json.dumps(serialization.json_loads(data))
+    assert json.dumps(json.loads(data)) == json.dumps(serialization.json_loads(data.encode()))
+
+
+def test_invalid_json_raises_value_error(json_decoder):
+    with pytest.raises(ValueError):
+        serialization.json_loads(b"<html>")
+
+
+def test_unknown_json_decoder():
+    with pytest.raises(ImportError):
+        serialization.use_json_decoder("no_such_json")
@@ -0,0 +1,40 @@
+import pytest
+
+from title_normalizer import longest_common_prefix, normalize_name, remove_unlock_suffixes
+
+
+@pytest.mark.parametrize("name, other, prefix", [
+    ("Alien Rage", "Alien Rage Full Game Unlock", "Alien Rage"),
+    ("Destiny™", "Destiny™", "Destiny™"),
+    ("CTR™: Crash Team Racing", "CTRTM: Crash Team Racing", "CTR™: Crash Team Racing"),
+    ("POKéMON Tower", "pokémon tower", "POKéMON Tower"),
+    # a char is only kept when its whole form matches
+    ("Pokémon X", "Pokemon Y", "Pok"),
+    ("Destiny™ 2", "Destiny 2", "Destiny"),
+    ("The Last of Us", "The Last of Us Full Game", "The Last of Us"),
+    ("The Walking Dead", "Walking Dead: Season One", "The Walking Dead"),
+    ("Walking Dead", "The Walking Dead", "Walking Dead"),
+    # only the article is stripped, not every leading "T", "h", "e" and space
+    ("Theatrhythm Final Fantasy", "Theatrhythm Final Fantasy Unlock", "Theatrhythm Final Fantasy"),
+    ("Heavy Rain", "Hell Yeah!", "He"),
+    ("The Puppeteer", "Rayman", ""),
+    ("Mighty No. 9", "", "")
+])
+def test_longest_common_prefix(name, other, prefix):
+    assert prefix == longest_common_prefix(name, other)
+
+
+def test_normalized_names_are_memoised():
+    assert normalize_name("The Last of Us") is normalize_name("The Last of Us")
+
+
+@pytest.mark.parametrize("title, stripped", [
+    ("Alien Rage Full Game Unlock", "Alien Rage"),
+    ("Rayman 3 HD - Full Game", "Rayman 3 HD"),
+    ("Rayman 3 HD – Full Game Unlock", "Rayman 3 HD"),
+    ("Sonic full game", "Sonic"),
+    ("Katamari Forever Unlock", "Katamari Forever"),
+    ("Metal Gear Solid 4: Guns of the Patriots", "Metal Gear Solid 4: Guns of the Patriots")
+])
+def test_remove_unlock_suffixes(title, stripped):
+    assert stripped == remove_unlock_suffixes(title)